@@ -3,14 +3,33 @@ IB Gateway CLI Package
 Consolidates all IB Gateway automation, screenshot, testing, and management functionality.
 """
 
+import importlib
+from typing import TYPE_CHECKING
+
 __version__ = "1.0.0"
 
-from .cli import IBGatewayCLI
-from .config import Config
-from .automate_ibgateway import AutomationHandler
-from .screenshot import ScreenshotHandler
-from .port_forwarder import PortForwarder
-from .connection_status import check_connection_status, ConnectionStatus, OverallStatus
+if TYPE_CHECKING:  # pragma: no cover
+    from .cli import IBGatewayCLI
+    from .config import Config
+    from .automate_ibgateway import AutomationHandler
+    from .screenshot import ScreenshotHandler
+    from .port_forwarder import PortForwarder
+    from .connection_status import check_connection_status, ConnectionStatus, OverallStatus
+
+# Public names are imported from their submodule on first access, so light entry
+# points such as ``python3 -m ibgateway_manager.healthcheck`` (run by Docker's
+# HEALTHCHECK) don't pull in dotenv, Pillow, numpy and Xlib just by importing
+# the package.
+_EXPORTS = {
+    "IBGatewayCLI": ".cli",
+    "Config": ".config",
+    "AutomationHandler": ".automate_ibgateway",
+    "ScreenshotHandler": ".screenshot",
+    "PortForwarder": ".port_forwarder",
+    "check_connection_status": ".connection_status",
+    "ConnectionStatus": ".connection_status",
+    "OverallStatus": ".connection_status",
+}
 
 __all__ = [
     "IBGatewayCLI",
@@ -23,3 +42,15 @@ __all__ = [
     "OverallStatus",
 ]
 
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
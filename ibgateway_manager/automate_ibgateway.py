@@ -3,18 +3,136 @@ IB Gateway GUI automation handler using xdotool.
 """
 
 import os
+import select
+import signal
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from Xlib import X, XK
+    from Xlib import display as xdisplay
+    from Xlib import error as xerror
+    from Xlib.ext import xtest
+    HAS_XLIB = True
+except ImportError:  # pragma: no cover
+    HAS_XLIB = False
 
 from .config import Config
 from .screenshot import ScreenshotHandler
+from .services import _xvfb_argv
+
+# Reference screenshots used to recognise GUI states.
+_REF_DIR = Path(__file__).resolve().parent.parent / "test-screenshots"
+
+# (api_type, trading_mode) -> reference screenshot of the login screen after
+# the API type and trading mode buttons have been clicked.
+_EXPECTED_STATE_PATHS = {
+    ("FIX", "LIVE"): _REF_DIR / "fix-live.png",
+    ("FIX", "PAPER"): _REF_DIR / "fix-paper.png",
+    ("IB_API", "LIVE"): _REF_DIR / "ibapi-live.png",
+    ("IB_API", "PAPER"): _REF_DIR / "ibapi-paper.png",
+}
+
+
+def _spawn_and_capture(
+    argv: Sequence[str],
+    env: Dict[str, str],
+    timeout: float,
+    capture: bool = True,
+    stdin_data: Optional[bytes] = None,
+) -> Tuple[int, bytes]:
+    """Run argv with os.posix_spawnp and return (returncode, stdout).
+
+    posix_spawn avoids copying the parent's page tables the way fork() does,
+    which keeps frequent short-lived xdotool calls cheap. stdin and stderr are
+    attached to /dev/null. stdout is always a pipe: the parent blocks in select()
+    until it reaches EOF, so it wakes as soon as the child exits rather than
+    polling waitpid. When capture is False the output is discarded and the
+    returned bytes are empty. If stdin_data is given it is written to the
+    child's stdin through a pipe instead; it must fit in the pipe buffer.
+
+    Raises:
+        subprocess.TimeoutExpired: if the process does not finish within timeout
+    """
+    read_fd, write_fd = os.pipe()
+    stdout_action = (os.POSIX_SPAWN_DUP2, write_fd, 1)
+    if stdin_data is not None:
+        stdin_read, stdin_write = os.pipe()
+        stdin_action = (os.POSIX_SPAWN_DUP2, stdin_read, 0)
+    else:
+        stdin_action = (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0)
+    try:
+        pid = os.posix_spawnp(
+            argv[0],
+            argv,
+            env,
+            file_actions=[
+                stdin_action,
+                stdout_action,
+                (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+            ],
+            # Python ignores SIGPIPE/SIGXFSZ; restore defaults like subprocess does.
+            setsigdef=(signal.SIGPIPE, signal.SIGXFSZ),
+        )
+    except BaseException:
+        os.close(read_fd)
+        os.close(write_fd)
+        if stdin_data is not None:
+            os.close(stdin_read)
+            os.close(stdin_write)
+        raise
+
+    if stdin_data is not None:
+        os.close(stdin_read)
+        try:
+            os.write(stdin_write, stdin_data)
+        except BrokenPipeError:
+            pass
+        finally:
+            os.close(stdin_write)
+
+    deadline = time.monotonic() + timeout
+    chunks = []
+    os.close(write_fd)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                raise subprocess.TimeoutExpired(argv, timeout)
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            if capture:
+                chunks.append(chunk)
+    finally:
+        os.close(read_fd)
+    _, status = os.waitpid(pid, 0)
+
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status), b"".join(chunks)
+    return os.WEXITSTATUS(status), b"".join(chunks)
 
 
 class AutomationHandler:
-    """Handles IB Gateway GUI automation using xdotool."""
+    """Handles IB Gateway GUI automation using xdotool (or XTEST via python-xlib)."""
+    
+    # GUI states recognised by screenshot comparison:
+    # state -> (reference image, check screenshot filename, threshold, max_diff_percentage)
+    _STATES = {
+        "pre_credentials": ("pre_credentials_state.png", "pre_credentials_state_check.png", 0.01, 10.0),
+        # Correct state shows: mean_diff=5.42, diff_percentage=6.06%
+        # threshold=0.03 allows mean_diff up to ~7.65 (5.42/255 ≈ 0.021, using 0.03 for margin)
+        # max_diff_percentage=8.0 allows up to 8% different pixels (6.06% < 8.0%)
+        "i_understand": ("i_understand.png", "i_understand_button_check.png", 0.03, 8.0),
+        "after_move": ("after_move_window_to_top_left.png", "after_move_window_to_top_left_check.png", 0.01, 10.0),
+    }
     
     def __init__(self, config: Config, verbose: bool = False):
         self.config = config
@@ -30,105 +148,442 @@ class AutomationHandler:
         self.PAPER_TRADING_BUTTON_X = 506
         self.PAPER_TRADING_BUTTON_Y = 229
         self.screenshotter = ScreenshotHandler(self.config, verbose=self.verbose)
+        # Persistent X connection for synthesized input (opened on first use)
+        self._xinput_display = None
     
     def log(self, message: str):
         """Print log message if verbose."""
         print(f"[AUTOMATION] {message}", flush=True)
     
+    # xdotool commands whose output is never used; their stdout is not captured.
+    _FIRE_AND_FORGET = frozenset({"mousemove", "click", "key", "type", "windowmove"})
+    
     def run_xdotool(self, *args) -> Optional[str]:
-        """Run xdotool command and return output."""
-        cmd = ["xdotool"] + list(args)
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        """Run xdotool command and return output ("" for fire-and-forget commands)."""
+        capture = not args or args[0] not in self._FIRE_AND_FORGET
+        if not capture:
+            sent = self._run_commands_xlib([args])
+            if sent:
+                return ""
+            if sent is None:
+                return None
+        cmd = ("xdotool",) + args
+        env = self.config.display_env
+        try:
+            returncode, stdout = _spawn_and_capture(cmd, env, timeout=10, capture=capture)
+            if returncode == 0:
+                return stdout.decode("utf-8", "replace").strip()
+            return None
+        except subprocess.TimeoutExpired:
+            self.log(f"Timeout running: {' '.join(cmd)}")
+            return None
+        except Exception as e:
+            self.log(f"Error running xdotool: {e}")
+            return None
+    
+    def run_xdotool_script(self, *commands: List[str]) -> bool:
+        """Run several xdotool commands in one process by feeding them to ``xdotool -``.
+
+        Each command is a list of xdotool arguments, e.g. ``["mousemove", "311", "212"]``;
+        ``["sleep", "0.3"]`` pauses inside xdotool. xdotool splits script lines on
+        whitespace and expands ``$`` variables, so if any argument contains whitespace,
+        ``$`` or ``#`` the commands are chained on the command line instead. When
+        python-xlib is available the commands are replayed over XTEST without
+        starting xdotool at all.
+
+        Returns:
+            True if xdotool exited successfully
+        """
+        sent = self._run_commands_xlib(commands)
+        if sent:
+            return True
+        if sent is None:
+            # Part of the input already reached the GUI; replaying would repeat it
+            return False
+        if any(ch.isspace() or ch in "$#" for command in commands for arg in command for ch in arg):
+            return self.run_xdotool_chain(*commands)
+        
+        script = "".join(" ".join(command) + "\n" for command in commands)
+        env = self.config.display_env
         try:
             result = subprocess.run(
-                cmd,
-                capture_output=True,
+                ["xdotool", "-"],
+                input=script,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
                 text=True,
                 env=env,
-                timeout=10
+                timeout=30
             )
-            if result.returncode == 0:
-                return result.stdout.strip()
-            return None
+            return result.returncode == 0
         except subprocess.TimeoutExpired:
-            self.log(f"Timeout running: {' '.join(cmd)}")
-            return None
+            self.log("Timeout running xdotool script")
+            return False
         except Exception as e:
             self.log(f"Error running xdotool: {e}")
+            return False
+    
+    # xdotool commands that swallow every remaining argument, so nothing can be
+    # chained after them on the same command line.
+    _CONSUMES_REST = frozenset({"type", "key"})
+    
+    def run_xdotool_chain(self, *commands: List[str]) -> bool:
+        """Run xdotool commands chained on one command line.
+
+        ``["mousemove", "311", "212"], ["click", "1"]`` becomes a single
+        ``xdotool mousemove 311 212 click 1`` process. Commands that consume the
+        rest of the line (``type``, ``key``) end the current chain, so a new
+        process is started for whatever follows them.
+
+        Returns:
+            True if every xdotool process exited successfully
+        """
+        sent = self._run_commands_xlib(commands)
+        if sent:
+            return True
+        if sent is None:
+            # Part of the input already reached the GUI; replaying would repeat it
+            return False
+        env = self.config.display_env
+        ok = True
+        argv = ["xdotool"]
+        for i, command in enumerate(commands):
+            text = None
+            if command[0] == "type" and len(command) > 1:
+                # Feed the text on stdin so it (e.g. the password) never shows up
+                # in /proc/<pid>/cmdline.
+                argv.extend(command[:-1])
+                argv.extend(("--file", "-"))
+                text = command[-1].encode("utf-8")
+            else:
+                argv.extend(command)
+            if command[0] not in self._CONSUMES_REST and i < len(commands) - 1:
+                continue
+            try:
+                returncode, _ = _spawn_and_capture(argv, env, timeout=30, capture=False, stdin_data=text)
+                ok = ok and returncode == 0
+            except subprocess.TimeoutExpired:
+                self.log("Timeout running xdotool chain")
+                return False
+            except Exception as e:
+                self.log(f"Error running xdotool: {e}")
+                return False
+            argv = ["xdotool"]
+        return ok
+    
+    # xdotool modifier names -> keysym names
+    _MODIFIER_KEYSYMS = {"ctrl": "Control_L", "shift": "Shift_L", "alt": "Alt_L", "super": "Super_L"}
+    
+    def _xlib_input(self):
+        """Return the persistent X connection used for synthesized input, or None.
+
+        None means python-xlib or the XTEST extension is unavailable and callers
+        should use xdotool.
+        """
+        if not HAS_XLIB:
+            return None
+        if self._xinput_display is None:
+            try:
+                d = xdisplay.Display(self.config.display)
+            except (xerror.DisplayError, OSError) as e:
+                self.log(f"Xlib input unavailable ({e}), using xdotool")
+                return None
+            if not d.has_extension("XTEST"):
+                d.close()
+                self.log("XTEST extension missing, using xdotool")
+                return None
+            self._xinput_display = d
+        return self._xinput_display
+    
+    def _xlib_keycode(self, d, keysym: int) -> Optional[Tuple[int, bool]]:
+        """Return (keycode, needs_shift) for keysym, or None if it isn't mapped."""
+        for keycode, index in d.keysym_to_keycodes(keysym):
+            if index in (0, 1):
+                return keycode, index == 1
+        return None
+    
+    def _compile_xlib_command(self, d, command) -> Optional[List[Callable[[], None]]]:
+        """Translate one xdotool command into XTEST actions, or None if unsupported."""
+        verb, args = command[0], list(command[1:])
+        if verb == "sleep":
+            seconds = float(args[0])
+            return [d.flush, lambda: time.sleep(seconds)]
+        if verb == "mousemove":
+            sync = "--sync" in args
+            x, y = (int(a) for a in args if a != "--sync")
+            actions = [lambda: xtest.fake_input(d, X.MotionNotify, x=x, y=y)]
+            return actions + [d.sync] if sync else actions
+        if verb == "click":
+            button = int(args[0])
+            return [
+                lambda: xtest.fake_input(d, X.ButtonPress, button),
+                lambda: xtest.fake_input(d, X.ButtonRelease, button),
+            ]
+        if verb == "windowmove":
+            wid, x, y = int(args[0]), int(args[1]), int(args[2])
+            return [lambda: d.create_resource_object("window", wid).configure(x=x, y=y), d.sync]
+        if verb == "key":
+            actions = []
+            for combo in args:
+                keycodes = []
+                for name in combo.split("+"):
+                    keysym = XK.string_to_keysym(self._MODIFIER_KEYSYMS.get(name.lower(), name))
+                    mapped = self._xlib_keycode(d, keysym) if keysym else None
+                    if mapped is None:
+                        return None
+                    keycodes.append(mapped[0])
+                actions += [lambda k=k: xtest.fake_input(d, X.KeyPress, k) for k in keycodes]
+                actions += [lambda k=k: xtest.fake_input(d, X.KeyRelease, k) for k in reversed(keycodes)]
+            return actions
+        if verb == "type":
+            delay = 0.012
+            if args[:1] == ["--delay"]:
+                delay = int(args[1]) / 1000
+                args = args[2:]
+            if len(args) != 1:
+                return None
+            shift = self._xlib_keycode(d, XK.string_to_keysym("Shift_L"))
+            actions = []
+            for ch in args[0]:
+                # Latin-1 keysyms equal the code point; others use the Unicode range.
+                keysym = ord(ch) if ord(ch) < 0x100 else 0x01000000 + ord(ch)
+                if ch == "\n":
+                    keysym = XK.string_to_keysym("Return")
+                mapped = self._xlib_keycode(d, keysym)
+                if mapped is None or (mapped[1] and shift is None):
+                    return None
+                keycode, needs_shift = mapped
+                if needs_shift:
+                    actions.append(lambda: xtest.fake_input(d, X.KeyPress, shift[0]))
+                actions += [
+                    lambda k=keycode: xtest.fake_input(d, X.KeyPress, k),
+                    lambda k=keycode: xtest.fake_input(d, X.KeyRelease, k),
+                ]
+                if needs_shift:
+                    actions.append(lambda: xtest.fake_input(d, X.KeyRelease, shift[0]))
+                actions += [d.flush, lambda: time.sleep(delay)]
+            return actions
+        return None
+    
+    def _run_commands_xlib(self, commands) -> Optional[bool]:
+        """Replay xdotool commands over one X connection using XTEST.
+
+        Every command is translated before anything is sent, so an unsupported
+        command or unmapped key leaves the GUI untouched and the caller can run
+        the whole batch through xdotool instead. Once input has started going
+        out, a failure must not be replayed: that would click twice or type the
+        username/password into a field a second time.
+
+        Returns:
+            True if the commands were sent, False if xdotool should be used, or
+            None if sending failed partway (report failure, don't retry)
+        """
+        d = self._xlib_input()
+        if d is None:
+            return False
+        try:
+            actions = []
+            for command in commands:
+                compiled = self._compile_xlib_command(d, command)
+                if compiled is None:
+                    return False
+                actions += compiled
+        except (ValueError, IndexError):
+            # Arguments xdotool would parse differently (e.g. window stack refs)
+            return False
+        except (xerror.XError, xerror.ConnectionClosedError, OSError) as e:
+            self.log(f"Xlib input failed ({e}), using xdotool")
+            self._xinput_display = None
+            return False
+        sent = 0
+        try:
+            for action in actions:
+                action()
+                sent += 1
+            d.sync()
+            return True
+        except (xerror.XError, xerror.ConnectionClosedError, OSError) as e:
+            self._xinput_display = None
+            if sent == 0:
+                self.log(f"Xlib input failed ({e}), using xdotool")
+                return False
+            self.log(f"Xlib input failed after part of it was sent ({e}); not replaying it")
             return None
     
     def find_ibgateway_window(self, timeout: int = 60) -> Optional[str]:
         """Find IB Gateway window using multiple search methods."""
         self.log("Waiting for IB Gateway window to appear...")
         
-        elapsed = 0
-        while elapsed < timeout:
-            # Try multiple search methods
-            window_id = self.run_xdotool("search", "--name", "IBKR Gateway")
-            if window_id:
-                self.log(f"✓ IB Gateway window found! Window ID: {window_id}")
-                return window_id.split()[0] if window_id else None
-            
-            time.sleep(1)
-            elapsed += 1
+        window_id = None
+        if HAS_XLIB:
+            try:
+                window_id = self._wait_for_window_xlib("IBKR Gateway", timeout)
+            except (xerror.DisplayError, xerror.ConnectionClosedError, OSError) as e:
+                self.log(f"Xlib window wait failed ({e}), falling back to xdotool")
+                window_id = self._search_window_xdotool("IBKR Gateway", timeout)
+        else:
+            window_id = self._search_window_xdotool("IBKR Gateway", timeout)
+        
+        if window_id:
+            self.log(f"✓ IB Gateway window found! Window ID: {window_id}")
+            return window_id
         
         self.log(f"ERROR: IB Gateway window not found after {timeout}s")
         return None
     
+    def _search_window_xdotool(self, name: str, timeout: int) -> Optional[str]:
+        """Block in one ``xdotool search --sync --name`` call until a window matches."""
+        try:
+            returncode, stdout = _spawn_and_capture(
+                ("xdotool", "search", "--sync", "--name", name),
+                self.config.display_env,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return None
+        except Exception as e:
+            self.log(f"Error running xdotool: {e}")
+            return None
+        window_ids = stdout.split()
+        if returncode != 0 or not window_ids:
+            return None
+        return window_ids[0].decode()
+    
+    def _wait_for_window_xlib(self, name: str, timeout: float) -> Optional[str]:
+        """Wait for a window whose WM_NAME contains ``name`` without polling.
+        
+        Subscribes to SubstructureNotify on the root window, scans the existing
+        tree once, then blocks on X events until a matching window is created,
+        mapped or renamed.
+        
+        Args:
+            name: Substring to look for in WM_NAME (case-insensitive, like xdotool)
+            timeout: Maximum time to wait in seconds
+            
+        Returns:
+            Window ID as a decimal string, or None on timeout
+        """
+        needle = name.lower()
+        
+        def matches(window) -> bool:
+            try:
+                wm_name = window.get_wm_name()
+            except xerror.XError:
+                return False
+            return bool(wm_name) and needle in wm_name.lower()
+        
+        d = xdisplay.Display(self.config.display)
+        try:
+            root = d.screen().root
+            root.change_attributes(event_mask=X.SubstructureNotifyMask)
+            d.sync()
+            name_atoms = {d.intern_atom("WM_NAME"), d.intern_atom("_NET_WM_NAME")}
+            
+            pending = list(root.query_tree().children)
+            while pending:
+                window = pending.pop(0)
+                if matches(window):
+                    return str(window.id)
+                try:
+                    window.change_attributes(event_mask=X.PropertyChangeMask)
+                    pending.extend(window.query_tree().children)
+                except xerror.XError:
+                    continue
+            
+            deadline = time.monotonic() + timeout
+            while True:
+                if not d.pending_events():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    select.select([d], [], [], remaining)
+                    continue
+                
+                event = d.next_event()
+                if event.type == X.CreateNotify:
+                    # WM_NAME is often set after creation; watch for it.
+                    try:
+                        event.window.change_attributes(event_mask=X.PropertyChangeMask)
+                    except xerror.XError:
+                        continue
+                    d.sync()
+                elif event.type == X.PropertyNotify:
+                    if event.atom not in name_atoms:
+                        continue
+                elif event.type != X.MapNotify:
+                    continue
+                
+                if matches(event.window):
+                    return str(event.window.id)
+        finally:
+            d.close()
+    
+    @staticmethod
+    def _click_commands(x: int, y: int) -> List[List[str]]:
+        """xdotool commands that double-click at (x, y)."""
+        # Move mouse to location (--sync returns once the pointer is there), then click.
+        # Callers that need the GUI to react poll for the expected state instead of sleeping.
+        return [
+            ["mousemove", "--sync", str(x), str(y)],
+            ["click", "1"],
+            ["click", "1"],
+        ]
+    
     def click_at_coordinates(self, window_id: str, x: int, y: int, button_name: str):
         """Click at coordinates in the specified window."""
         self.log(f"Clicking {button_name} at coordinates ({x}, {y})")
-        
-        # Move mouse to location
-        self.run_xdotool("mousemove", str(x), str(y))
-        time.sleep(0.3)
-        
-        # Click
-        self.run_xdotool("click", "1")
-        self.run_xdotool("click", "1")
-        time.sleep(0.5)
-        
+        self.run_xdotool_chain(*self._click_commands(x, y))
         self.log(f"✓ Clicked {button_name}")
     
+    def _api_type_button(self) -> Tuple[int, int, str]:
+        """Return (x, y, name) of the button for the configured API type."""
+        if self.config.api_type == "FIX":
+            return self.FIX_BUTTON_X, self.FIX_BUTTON_Y, "FIX CTCI"
+        return self.IB_API_BUTTON_X, self.IB_API_BUTTON_Y, "IB API"
+    
+    def _trading_mode_button(self) -> Tuple[int, int, str]:
+        """Return (x, y, name) of the button for the configured trading mode."""
+        if self.config.trading_mode == "LIVE":
+            return self.LIVE_TRADING_BUTTON_X, self.LIVE_TRADING_BUTTON_Y, "Live Trading"
+        return self.PAPER_TRADING_BUTTON_X, self.PAPER_TRADING_BUTTON_Y, "Paper Trading"
+    
     def click_api_type_button(self, window_id: str):
         """Click the API type button (FIX or IB_API)."""
         self.log(f"--- Configuring API Type: {self.config.api_type} ---")
-        
-        if self.config.api_type == "FIX":
-            self.click_at_coordinates(
-                window_id,
-                self.FIX_BUTTON_X,
-                self.FIX_BUTTON_Y,
-                "FIX CTCI"
-            )
-        else:
-            self.click_at_coordinates(
-                window_id,
-                self.IB_API_BUTTON_X,
-                self.IB_API_BUTTON_Y,
-                "IB API"
-            )
+        self.click_at_coordinates(window_id, *self._api_type_button())
     
     def click_trading_mode_button(self, window_id: str):
         """Click the trading mode button (LIVE or PAPER)."""
         self.log(f"--- Configuring Trading Mode: {self.config.trading_mode} ---")
-        
-        if self.config.trading_mode == "LIVE":
-            self.click_at_coordinates(
-                window_id,
-                self.LIVE_TRADING_BUTTON_X,
-                self.LIVE_TRADING_BUTTON_Y,
-                "Live Trading"
-            )
-        else:
-            self.click_at_coordinates(
-                window_id,
-                self.PAPER_TRADING_BUTTON_X,
-                self.PAPER_TRADING_BUTTON_Y,
-                "Paper Trading"
-            )
-        time.sleep(1)
+        self.click_at_coordinates(window_id, *self._trading_mode_button())
+    
+    def select_api_type_and_trading_mode(self, window_id: str):
+        """Click the API type and trading mode buttons in a single xdotool run."""
+        self.log(f"--- Configuring API Type: {self.config.api_type}, Trading Mode: {self.config.trading_mode} ---")
+        api_x, api_y, api_name = self._api_type_button()
+        mode_x, mode_y, mode_name = self._trading_mode_button()
+        self.run_xdotool_chain(
+            *self._click_commands(api_x, api_y),
+            *self._click_commands(mode_x, mode_y),
+        )
+        self.log(f"✓ Clicked {api_name} and {mode_name}")
+    
+    def _username_commands(self) -> List[List[str]]:
+        """xdotool script commands that type the username into the focused field."""
+        return [
+            ["type", "--delay", "50", self.config.username],
+            ["sleep", "0.5"],
+        ]
+    
+    def _password_commands(self) -> List[List[str]]:
+        """xdotool script commands that tab to the password field, type it and submit."""
+        return [
+            ["key", "Tab"],
+            ["sleep", "0.3"],
+            ["type", "--delay", "50", self.config.password],
+            ["sleep", "0.5"],
+            ["key", "Return"],
+        ]
     
     def type_username(self, window_id: str):
         """Type username into the focused field."""
@@ -137,8 +592,7 @@ class AutomationHandler:
             return
         
         self.log("--- Typing Username ---")
-        self.run_xdotool("type", "--delay", "50", self.config.username)
-        time.sleep(0.5)
+        self.run_xdotool_script(*self._username_commands())
         self.log("✓ Username typed")
     
     def type_password(self, window_id: str):
@@ -148,16 +602,64 @@ class AutomationHandler:
             return
         
         self.log("--- Typing Password ---")
-        self.run_xdotool("key", "Tab")
-        time.sleep(0.3)
-        self.run_xdotool("type", "--delay", "50", self.config.password)
-        time.sleep(0.5)
+        self.run_xdotool_script(*self._password_commands())
         self.log("✓ Password typed")
-        self.run_xdotool("key", "Return")
+    
+    def enter_credentials(self, window_id: str):
+        """Type username and password and submit, in a single xdotool run."""
+        if not self.config.username or not self.config.password:
+            self.type_username(window_id)
+            self.type_password(window_id)
+            return
+        
+        self.log("--- Typing Username and Password ---")
+        self.run_xdotool_script(*self._username_commands(), *self._password_commands())
+        self.log("✓ Credentials typed")
+    
+    def _list_windows_xlib(self) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """Walk the X window tree over one connection.
+
+        Returns:
+            List of (window_id, name, class_name) for windows with a name or class,
+            matching what ``xdotool search --all .`` reports
+        """
+        d = xdisplay.Display(self.config.display)
+        try:
+            windows = []
+            pending = list(d.screen().root.query_tree().children)
+            while pending:
+                window = pending.pop(0)
+                try:
+                    name = window.get_wm_name()
+                    wm_class = window.get_wm_class()
+                    pending.extend(window.query_tree().children)
+                except xerror.XError:
+                    # Window went away while we were walking the tree.
+                    continue
+                class_name = wm_class[1] if wm_class else None
+                if name or class_name:
+                    windows.append((str(window.id), name, class_name))
+            return windows
+        finally:
+            d.close()
     
     def list_all_windows(self):
         """List all windows with their IDs and names."""
         self.log("--- Listing All Windows ---")
+        if HAS_XLIB:
+            try:
+                windows = self._list_windows_xlib()
+            except Exception as e:
+                self.log(f"Xlib window listing failed, falling back to xdotool: {e}")
+            else:
+                if not windows:
+                    self.log("No windows found")
+                    return
+                for wid, name, class_name in windows:
+                    self.log(f"  Window ID: {wid} | Name: '{name or '(no name)'}' | Class: '{class_name or '(no class)'}'")
+                self.log("")
+                return
+        
         window_ids_output = self.run_xdotool("search", "--all", ".")
         if not window_ids_output:
             self.log("No windows found")
@@ -168,12 +670,44 @@ class AutomationHandler:
             self.log("No windows found")
             return
         
-        for wid in window_ids:
-            name = self.run_xdotool("getwindowname", wid) or "(no name)"
-            class_name = self.run_xdotool("getwindowclassname", wid) or "(no class)"
-            self.log(f"  Window ID: {wid} | Name: '{name}' | Class: '{class_name}'")
+        # The queries only wait on xdotool processes, so run them side by side.
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            names_future = executor.submit(self._query_windows_xdotool, "getwindowname", window_ids)
+            classes_future = executor.submit(self._query_windows_xdotool, "getwindowclassname", window_ids)
+            names = names_future.result()
+            if names is None:
+                names = list(executor.map(lambda wid: self.run_xdotool("getwindowname", wid), window_ids))
+            class_names = classes_future.result()
+            if class_names is None:
+                class_names = list(executor.map(lambda wid: self.run_xdotool("getwindowclassname", wid), window_ids))
+        
+        for wid, name, class_name in zip(window_ids, names, class_names):
+            self.log(f"  Window ID: {wid} | Name: '{name or '(no name)'}' | Class: '{class_name or '(no class)'}'")
         self.log("")
     
+    def _query_windows_xdotool(self, verb: str, window_ids: List[str]) -> Optional[List[str]]:
+        """Run one xdotool query verb for many windows in a single process.
+
+        Chains ``xdotool <verb> id1 <verb> id2 ...`` and splits the output into one
+        line per window.
+
+        Returns:
+            One output line per window ID, or None if xdotool failed part-way
+            (e.g. a window vanished) and the lines can't be matched to IDs
+        """
+        argv = ["xdotool"]
+        for wid in window_ids:
+            argv += (verb, wid)
+        try:
+            returncode, stdout = _spawn_and_capture(argv, self.config.display_env, timeout=10)
+        except Exception as e:
+            self.log(f"Error running xdotool: {e}")
+            return None
+        lines = stdout.decode("utf-8", "replace").split("\n")[:-1]
+        if returncode != 0 or len(lines) != len(window_ids):
+            return None
+        return lines
+    
     def move_window_to_top_left(self, window_id: str):
         """Move window to top-left corner (0, 0)."""
         self.log(f"Moving window {window_id} to top-left corner (0, 0)")
@@ -183,12 +717,7 @@ class AutomationHandler:
 
     def _expected_state_screenshot_path(self) -> Path:
         """Return reference screenshot path for current config."""
-        project_root = Path(__file__).resolve().parent.parent
-        ref_dir = project_root / "test-screenshots"
-
-        api_prefix = "fix" if self.config.api_type == "FIX" else "ibapi"
-        mode_suffix = "live" if self.config.trading_mode == "LIVE" else "paper"
-        return ref_dir / f"{api_prefix}-{mode_suffix}.png"
+        return _EXPECTED_STATE_PATHS[(self.config.api_type, self.config.trading_mode)]
 
     def verify_target_state_before_credentials(self, timeout: int = 30) -> bool:
         """Wait for the GUI to reach the expected post-click state before typing credentials."""
@@ -213,7 +742,9 @@ class AutomationHandler:
             threshold=0.15,
             max_diff_percentage=20.0,
             success_message="✓ Target state verified before typing credentials",
-            waiting_message=None  # Use default waiting message
+            waiting_message=None,  # Use default waiting message
+            poll_interval=0.25,
+            downsample=4,  # the loose thresholds only need a coarse comparison
         )
 
         if not success:
@@ -223,65 +754,32 @@ class AutomationHandler:
 
         return True
     
-    def wait_for_pre_credentials_state(self, timeout: int = 30) -> bool:
-        """Wait until screenshot matches pre_credentials_state.png reference image."""
-        project_root = Path(__file__).resolve().parent.parent
-        reference_path = project_root / "test-screenshots" / "pre_credentials_state.png"
-        
-        self.log("Waiting for window to reach pre-credentials state...")
-        
+    def _wait_for_ref(self, state: str, timeout: int = 30) -> bool:
+        """Wait until a screenshot matches the reference image for a state in _STATES."""
+        reference_name, check_name, threshold, max_diff_percentage = self._STATES[state]
         success, _ = self.screenshotter.wait_for_state_match(
-            str(reference_path),
-            "pre_credentials_state_check.png",
+            str(_REF_DIR / reference_name),
+            check_name,
             timeout=timeout,
-            threshold=0.01,
-            max_diff_percentage=10.0,
-            success_message=None,  # Use default message
-            waiting_message=None   # Use default message
+            threshold=threshold,
+            max_diff_percentage=max_diff_percentage,
         )
-        
         return success
+    
+    def wait_for_pre_credentials_state(self, timeout: int = 30) -> bool:
+        """Wait until screenshot matches pre_credentials_state.png reference image."""
+        self.log("Waiting for window to reach pre-credentials state...")
+        return self._wait_for_ref("pre_credentials", timeout)
 
     def wait_for_i_understand_button(self, timeout: int = 30) -> bool:
         """Wait until screenshot matches i_understand.png reference image."""
-        project_root = Path(__file__).resolve().parent.parent
-        reference_path = project_root / "test-screenshots" / "i_understand.png"
-        
         self.log("Waiting for I understand button to appear...")
-        
-        # Correct state shows: mean_diff=5.42, diff_percentage=6.06%
-        # threshold=0.03 allows mean_diff up to ~7.65 (5.42/255 ≈ 0.021, using 0.03 for margin)
-        # max_diff_percentage=8.0 allows up to 8% different pixels (6.06% < 8.0%)
-        success, _ = self.screenshotter.wait_for_state_match(
-            str(reference_path),
-            "i_understand_button_check.png",
-            timeout=timeout,
-            threshold=0.03,
-            max_diff_percentage=8.0,
-            success_message=None,  # Use default message
-            waiting_message=None   # Use default message
-        )
-        
-        return success
+        return self._wait_for_ref("i_understand", timeout)
 
     def wait_for_after_move_window_to_top_left(self, timeout: int = 30) -> bool:
         """Wait until screenshot matches after_move_window_to_top_left.png reference image."""
-        project_root = Path(__file__).resolve().parent.parent
-        reference_path = project_root / "test-screenshots" / "after_move_window_to_top_left.png"
-        
         self.log("Waiting for window to reach after-move state...")
-        
-        success, _ = self.screenshotter.wait_for_state_match(
-            str(reference_path),
-            "after_move_window_to_top_left_check.png",
-            timeout=timeout,
-            threshold=0.01,
-            max_diff_percentage=10.0,
-            success_message=None,  # Use default message
-            waiting_message=None   # Use default message
-        )
-        
-        return success
+        return self._wait_for_ref("after_move", timeout)
 
     def click_i_understand_button(self, window_id: str):
         """Click the I understand button."""
@@ -304,6 +802,13 @@ class AutomationHandler:
             self.log("ERROR: IBGATEWAY_PASSWORD is not set. Password is required for automation.")
             return 1
         
+        # Decode the reference screenshots while IB Gateway is still starting up.
+        references = [_REF_DIR / name for name, _, _, _ in self._STATES.values()]
+        references.append(self._expected_state_screenshot_path())
+        threading.Thread(
+            target=self.screenshotter.preload_references, args=(references,), name="preload-references", daemon=True
+        ).start()
+        
         self.list_all_windows()
         
         window_id = self.find_ibgateway_window()
@@ -320,11 +825,8 @@ class AutomationHandler:
         # Wait until screenshot matches after_move_window_to_top_left.png
         self.wait_for_after_move_window_to_top_left()
         
-        # Click API Type button
-        self.click_api_type_button(window_id)
-        
-        # Click Trading Mode button
-        self.click_trading_mode_button(window_id)
+        # Click API Type and Trading Mode buttons
+        self.select_api_type_and_trading_mode(window_id)
         
         # Before typing credentials, verify we reached the expected target state.
         if not self.verify_target_state_before_credentials():
@@ -332,8 +834,7 @@ class AutomationHandler:
             return 1
 
         # Type username/password
-        self.type_username(window_id)
-        self.type_password(window_id)
+        self.enter_credentials(window_id)
 
         # Wait for the I understand button to appear
         self.wait_for_i_understand_button()
@@ -348,12 +849,11 @@ class AutomationHandler:
     
     def run_ibgateway(self) -> int:
         """Run IB Gateway with minimal setup (Xvfb + IB Gateway)."""
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        env = self.config.display_env
         
         self.log("--- Starting Xvfb ---")
         xvfb_process = subprocess.Popen(
-            ["Xvfb", self.config.display, "-screen", "0", f"{self.config.resolution}x24", "-ac", "+extension", "GLX", "+render", "-noreset"],
+            _xvfb_argv(self.config.display, self.config.resolution),
             env=env
         )
         time.sleep(2)
@@ -2,8 +2,10 @@
 Configuration management for IB Gateway CLI.
 """
 
+import functools
 import os
 from pathlib import Path
+from typing import Dict, Optional
 
 try:
     from dotenv import load_dotenv
@@ -12,6 +14,17 @@ except ImportError:
     HAS_DOTENV = False
 
 
+@functools.lru_cache(maxsize=1)
+def _find_env_file() -> Optional[Path]:
+    """Return the first .env file found, looked up once per process."""
+    script_dir = Path(__file__).parent.parent
+    # Path(".env") is relative to the current directory, so it also covers cwd.
+    for env_file in (script_dir / ".env", Path(".env")):
+        if env_file.exists():
+            return env_file
+    return None
+
+
 class Config:
     """Configuration management with .env file and environment variable support."""
     
@@ -21,17 +34,10 @@ class Config:
     def load_config(self):
         """Load configuration from .env file and environment variables."""
         # Try to load .env file from script directory or current directory
-        script_dir = Path(__file__).parent.parent
-        env_files = [
-            script_dir / ".env",
-            Path(".env"),
-            Path.cwd() / ".env"
-        ]
-        
-        for env_file in env_files:
-            if env_file.exists() and HAS_DOTENV:
+        if HAS_DOTENV:
+            env_file = _find_env_file()
+            if env_file is not None:
                 load_dotenv(env_file)
-                break
         
         # Configuration values (env vars override .env file)
         self.username = os.getenv("IBGATEWAY_USERNAME", "")
@@ -42,6 +48,9 @@ class Config:
         self.resolution = os.getenv("RESOLUTION", "1024x768")
         self.screenshot_dir = os.getenv("SCREENSHOT_DIR", "/tmp/screenshots")
         self.screenshot_port = int(os.getenv("SCREENSHOT_PORT", "8080"))
+        self._display_env: Optional[Dict[str, str]] = None
+        self.save_raw_screenshots = os.getenv("SCREENSHOT_SAVE_RAW", "0").lower() in ("1", "true", "yes")
+        self.raw_retention_minutes = int(os.getenv("SCREENSHOT_RAW_RETENTION_MINUTES", "30"))
         
         # Validate API type
         if self.api_type not in ["FIX", "IB_API"]:
@@ -51,6 +60,20 @@ class Config:
         if self.trading_mode not in ["LIVE", "PAPER"]:
             raise ValueError(f"IB_TRADING_MODE must be 'LIVE' or 'PAPER', got: {self.trading_mode}")
     
+    @property
+    def display_env(self) -> Dict[str, str]:
+        """Environment for X clients: os.environ with DISPLAY set to self.display.
+        
+        The dict is built once and shared by every subprocess launch (rebuilt only
+        if display changes), so callers must not modify it.
+        """
+        env = self._display_env
+        if env is None or env.get("DISPLAY") != self.display:
+            env = os.environ.copy()
+            env["DISPLAY"] = self.display
+            self._display_env = env
+        return env
+    
     def print_config(self):
         """Print current configuration."""
         print("--- IB Gateway Configuration ---")
@@ -62,5 +85,6 @@ class Config:
         print(f"Resolution: {self.resolution}")
         print(f"Screenshot Directory: {self.screenshot_dir}")
         print(f"Screenshot Port: {self.screenshot_port}")
+        print(f"Save Raw Screenshots: {self.save_raw_screenshots}")
         print()
 
@@ -8,12 +8,20 @@ Fallback: TCP connection test to the internal API port (used when the screenshot
 server is not yet available during container startup):
   - LIVE  -> 127.0.0.1:4001
   - PAPER -> 127.0.0.1:4002
+
+When the orchestrator's healthcheck daemon (healthcheck_daemon.py) is running,
+its cached result is read from a unix socket instead of re-running the checks.
 """
 
 from __future__ import annotations
 
+# Runs on every Docker probe: keep imports to the standard library and don't
+# import Config (dotenv) or the screenshot/automation modules from here.
+
+import errno
 import json
 import os
+import select
 import socket
 import sys
 import urllib.error
@@ -42,6 +50,28 @@ class HealthcheckConfig:
     timeout_seconds: float
 
 
+DEFAULT_SOCKET_PATH = "/run/ibgateway-health.sock"
+
+
+def socket_path_from_env() -> str:
+    return os.getenv("IBGATEWAY_HEALTHCHECK_SOCKET", DEFAULT_SOCKET_PATH)
+
+
+def query_daemon(socket_path: str, timeout: float) -> tuple[int, str] | None:
+    """Read the cached result from a running healthcheck daemon, or None if unreachable."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            line = sock.makefile("rb").readline().decode()
+    except OSError:
+        return None
+    code, _, message = line.rstrip("\n").partition(" ")
+    if not code.isdigit():
+        return None
+    return int(code), message
+
+
 def _port_for_trading_mode(trading_mode: str) -> int:
     mode = (trading_mode or "").strip().upper()
     if mode == "LIVE":
@@ -69,11 +99,22 @@ def build_config_from_env() -> HealthcheckConfig:
 
 
 def check_tcp_listening(cfg: HealthcheckConfig) -> bool:
+    # Non-blocking connect: a refused port (gateway not listening yet) fails
+    # straight away; only a handshake still in progress waits on select().
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
-        with socket.create_connection((cfg.host, cfg.port), timeout=cfg.timeout_seconds):
-            return True
+        sock.setblocking(False)
+        err = sock.connect_ex((cfg.host, cfg.port))
+        if err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+            _, writable, _ = select.select([], [sock], [], cfg.timeout_seconds)
+            if not writable:
+                return False
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        return err == 0
     except OSError:
         return False
+    finally:
+        sock.close()
 
 
 def check_visual_health(timeout: float) -> tuple[str, dict | None]:
@@ -104,14 +145,8 @@ def check_visual_health(timeout: float) -> tuple[str, dict | None]:
         return "unhealthy", None
 
 
-def main(argv: list[str] | None = None) -> int:
-    _ = argv  # reserved; keep signature stable for future flags if needed
-    try:
-        cfg = build_config_from_env()
-    except Exception as exc:
-        _log(f"[HEALTHCHECK] invalid config: {exc}")
-        return 1
-
+def run_checks(cfg: HealthcheckConfig) -> tuple[int, str]:
+    """Run the visual check, falling back to TCP, and return (exit_code, message)."""
     # --- Visual check (preferred) ---
     visual_status, detail = check_visual_health(timeout=cfg.timeout_seconds)
 
@@ -122,32 +157,41 @@ def main(argv: list[str] | None = None) -> int:
     summary = ", ".join(f"{r['name']}={r['color']}" for r in rows) if rows else "no row data"
 
     if visual_status == "healthy":
-        _log(f"[HEALTHCHECK] healthy: {summary}{screenshot_info}")
-        return 0
+        return 0, f"[HEALTHCHECK] healthy: {summary}{screenshot_info}"
 
     if visual_status == "degraded":
-        _log(f"[HEALTHCHECK] degraded: {summary}{screenshot_info}")
-        return 0
+        return 0, f"[HEALTHCHECK] degraded: {summary}{screenshot_info}"
 
     if visual_status == "unhealthy":
         error_msg = detail.get("error") if detail else None
-        _log(
+        return 1, (
             f"[HEALTHCHECK] unhealthy: {summary}{screenshot_info}"
             + (f" | error: {error_msg}" if error_msg else "")
         )
-        return 1
 
     # visual_status == "unavailable": screenshot server not yet up, fall back to TCP
     ok = check_tcp_listening(cfg)
     if ok:
-        _log(f"[HEALTHCHECK] healthy (tcp fallback): {cfg.host}:{cfg.port}")
-        return 0
+        return 0, f"[HEALTHCHECK] healthy (tcp fallback): {cfg.host}:{cfg.port}"
 
-    _log(
+    return 1, (
         f"[HEALTHCHECK] not ready: tcp://{cfg.host}:{cfg.port} (timeout={cfg.timeout_seconds}s)"
         " and visual check unavailable"
     )
-    return 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    _ = argv  # reserved; keep signature stable for future flags if needed
+    try:
+        cfg = build_config_from_env()
+    except Exception as exc:
+        _log(f"[HEALTHCHECK] invalid config: {exc}")
+        return 1
+
+    cached = query_daemon(socket_path_from_env(), cfg.timeout_seconds)
+    code, message = cached if cached is not None else run_checks(cfg)
+    _log(message)
+    return code
 
 
 if __name__ == "__main__":
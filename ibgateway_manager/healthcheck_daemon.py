@@ -0,0 +1,128 @@
+"""
+Long-running companion to the Docker HEALTHCHECK helper.
+
+Runs the same checks as ``python3 -m ibgateway_manager.healthcheck`` on a timer
+inside the orchestrator process and serves the latest result on a unix socket.
+The HEALTHCHECK command then only has to read one line from the socket instead
+of starting a Python interpreter every interval.
+
+Each connection receives a single line: ``<exit code> <message>``.
+"""
+
+from __future__ import annotations
+
+import os
+import socketserver
+import threading
+import time
+
+from .healthcheck import (
+    DEFAULT_SOCKET_PATH,
+    HealthcheckConfig,
+    _log,
+    build_config_from_env,
+    run_checks,
+    socket_path_from_env,
+)
+
+
+class HealthcheckDaemon:
+    """Caches healthcheck results and serves them on a unix socket."""
+
+    def __init__(
+        self,
+        cfg: HealthcheckConfig,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        interval_seconds: float = 10.0,
+    ):
+        self.cfg = cfg
+        self.socket_path = socket_path
+        self.interval_seconds = interval_seconds
+        # Starts as "not ready" until the first check completes.
+        self._result = (1, "[HEALTHCHECK] not ready: first check pending")
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server: socketserver.UnixStreamServer | None = None
+
+    def current(self) -> tuple[int, str]:
+        """Return the latest (exit_code, message), or unhealthy if it went stale."""
+        with self._lock:
+            code, message = self._result
+            age = time.monotonic() - self._checked_at
+        if age > 3 * self.interval_seconds + self.cfg.timeout_seconds:
+            return 1, f"[HEALTHCHECK] stale: last check {age:.0f}s ago ({message})"
+        return code, message
+
+    def check_once(self) -> None:
+        """Run the checks and store the result, logging only when it changes."""
+        try:
+            result = run_checks(self.cfg)
+        except Exception as exc:
+            result = (1, f"[HEALTHCHECK] check failed: {exc}")
+        with self._lock:
+            previous = self._result
+            self._result = result
+            self._checked_at = time.monotonic()
+        if result != previous:
+            _log(result[1])
+
+    def _check_loop(self) -> None:
+        while not self._stop.is_set():
+            self.check_once()
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        """Bind the socket and start the checker and server threads."""
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                code, message = daemon.current()
+                self.request.sendall(f"{code} {message}\n".encode())
+
+        self._server = socketserver.UnixStreamServer(self.socket_path, Handler)
+        threading.Thread(target=self._check_loop, name="healthcheck-checker", daemon=True).start()
+        threading.Thread(target=self._server.serve_forever, name="healthcheck-server", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop serving and remove the socket."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def start_from_env() -> HealthcheckDaemon:
+    """Create and start a daemon configured from the environment.
+
+    Environment:
+        IBGATEWAY_HEALTHCHECK_SOCKET: socket path (default /run/ibgateway-health.sock)
+        IBGATEWAY_HEALTHCHECK_INTERVAL_SECONDS: seconds between checks (default 10)
+    """
+    interval_raw = os.getenv("IBGATEWAY_HEALTHCHECK_INTERVAL_SECONDS", "10").strip()
+    try:
+        interval = float(interval_raw)
+    except ValueError as exc:
+        raise ValueError(
+            "IBGATEWAY_HEALTHCHECK_INTERVAL_SECONDS must be a number "
+            f"(got {interval_raw!r})"
+        ) from exc
+
+    daemon = HealthcheckDaemon(
+        build_config_from_env(),
+        socket_path=socket_path_from_env(),
+        interval_seconds=interval,
+    )
+    daemon.start()
+    return daemon
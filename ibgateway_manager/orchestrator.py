@@ -2,18 +2,61 @@
 Service orchestrator for IB Gateway - coordinates all services.
 """
 
+import asyncio
+import functools
+import http.client
 import os
 import signal
 import subprocess
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from .config import Config
 from .screenshot import ScreenshotHandler
-from .services import XvfbManager, VNCManager, NoVNCManager, WindowManager
+from .services import (
+    XvfbManager,
+    VNCManager,
+    NoVNCManager,
+    WindowManager,
+    _LogTailer,
+    _LogWatcher,
+    _pidfd_open,
+    _read_log_tail,
+    _spawn,
+    _wait,
+    _wait_async,
+    shutdown_all,
+)
 from .port_forwarder import PortForwarder
+from . import healthcheck_daemon
+
+
+def _open_child_log(path: str):
+    """Open a log file to hand to a child as stdout: truncated, unbuffered, O_APPEND.
+
+    O_APPEND keeps every write at the current end of file, so the child's output
+    stays contiguous even if the log is truncated underneath it.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND | os.O_CLOEXEC, 0o644)
+    return os.fdopen(fd, "wb", buffering=0)
+
+
+@functools.lru_cache(maxsize=1)
+def _find_cli_script() -> str:
+    """Return the CLI entry script path, looked up once per process.
+
+    Prefers /ibgateway_manager_cli.py (Docker container path), then the copy
+    next to this package in a source checkout.
+    """
+    cli_script = "/ibgateway_manager_cli.py"
+    if not os.path.exists(cli_script):
+        potential_path = Path(__file__).resolve().parent.parent / "ibgateway_manager_cli.py"
+        if potential_path.exists():
+            cli_script = str(potential_path)
+    return cli_script
 
 
 class ServiceOrchestrator:
@@ -34,7 +77,13 @@ class ServiceOrchestrator:
         self.automation_process: Optional[subprocess.Popen] = None
         self.screenshot_process: Optional[subprocess.Popen] = None
         self.port_forwarder: Optional[PortForwarder] = None
-        self.tail_process: Optional[subprocess.Popen] = None
+        self.log_tailer: Optional[_LogTailer] = None
+        self.healthcheck_daemon: Optional[healthcheck_daemon.HealthcheckDaemon] = None
+        
+        # Open log watchers keyed by (path, marker), so repeated checks only
+        # read what was appended since the last one
+        self._log_watchers: Dict[Tuple[str, str], _LogWatcher] = {}
+        self._screenshot_probe: Optional[http.client.HTTPConnection] = None
         
         # Log files
         self.log_files = [
@@ -57,48 +106,61 @@ class ServiceOrchestrator:
         """Create log files."""
         self.log("=== Create and stream logs ===")
         for log_file in self.log_files:
-            Path(log_file).touch()
+            # Create if missing; unlike touch() this leaves the mtime alone
+            os.close(os.open(log_file, os.O_CREAT | os.O_WRONLY | os.O_CLOEXEC, 0o644))
     
     def _start_log_tailing(self):
         """Start tailing log files."""
         if self.verbose:
             # Tail all logs in verbose mode
-            self.tail_process = subprocess.Popen(
-                ["tail", "-f"] + self.log_files,
-                stdout=sys.stdout,
-                stderr=sys.stderr
-            )
+            self.log_tailer = _LogTailer(self.log_files)
         else:
             # Only tail automation log in normal mode
-            self.tail_process = subprocess.Popen(
-                ["tail", "-f", "/tmp/automate-ibgateway.log"],
-                stdout=sys.stdout,
-                stderr=sys.stderr
+            self.log_tailer = _LogTailer(["/tmp/automate-ibgateway.log"])
+        self.log_tailer.start()
+    
+    def _log_watcher(self, path: str, marker: str) -> _LogWatcher:
+        """Return the watcher for marker in path, creating it on first use."""
+        watcher = self._log_watchers.get((path, marker))
+        if watcher is None:
+            watcher = self._log_watchers[(path, marker)] = _LogWatcher(path, marker)
+        return watcher
+    
+    def _scan_new(self, path: str, marker: str) -> bool:
+        """Return True once marker has appeared in path, scanning only newly appended bytes."""
+        return self._log_watcher(path, marker).found()
+    
+    def _start_service(self, manager) -> bool:
+        """Start a service manager and wait until it is ready."""
+        return manager.start() and manager.wait_for_ready()
+    
+    def _probe_screenshot_service(self) -> Optional[bool]:
+        """Readiness check for _wait: True if the screenshot service answers, else None."""
+        # One connection object for every probe (it reopens its socket as needed);
+        # HEAD keeps the response bodiless
+        if self._screenshot_probe is None:
+            self._screenshot_probe = http.client.HTTPConnection(
+                "127.0.0.1", self.config.screenshot_port, timeout=0.5
             )
+        probe = self._screenshot_probe
+        try:
+            probe.request("HEAD", "/")
+            response = probe.getresponse()
+            response.read()
+            if response.status < 500:
+                return True
+        except (OSError, http.client.HTTPException):
+            # Reconnects on the next request
+            probe.close()
+        return None
     
     def _wait_for_screenshot_service(self, timeout: int = 60) -> bool:
         """Wait for screenshot service to be ready."""
         self.log("Waiting for screenshot service to be ready...")
         
-        for i in range(timeout):
-            try:
-                import urllib.request
-                response = urllib.request.urlopen(f"http://localhost:{self.config.screenshot_port}/", timeout=1)
-                if response.getcode() == 200:
-                    # If port is accessible, consider it ready
-                    self.log("✓ Screenshot service is ready")
-                    return True
-            except Exception:
-                pass
-            
-            # Also check log file for ready message
-            if Path("/tmp/screenshot-server.log").exists():
-                log_content = Path("/tmp/screenshot-server.log").read_text()
-                if "Screenshot service ready" in log_content:
-                    self.log("✓ Screenshot service is ready")
-                    return True
-            
-            time.sleep(1)
+        if _wait(self._probe_screenshot_service, timeout):
+            self.log("✓ Screenshot service is ready")
+            return True
         
         self.log("ERROR: Screenshot service failed to start")
         return False
@@ -107,80 +169,62 @@ class ServiceOrchestrator:
         """Wait for automation to complete."""
         self.log("Waiting for automation to complete...")
         
-        for i in range(timeout):
-            # Check if process crashed
-            if self.automation_process and self.automation_process.poll() is not None:
-                exit_code = self.automation_process.returncode
-                # Process finished, check log for completion
-                if Path("/tmp/automate-ibgateway.log").exists():
-                    log_content = Path("/tmp/automate-ibgateway.log").read_text()
-                    if "Configuration Complete" in log_content:
-                        self.log("✓ Automation completed")
-                        return True
-                    else:
-                        # Process exited but didn't complete - check exit code
-                        if exit_code != 0:
-                            self.log(f"ERROR: Automation process exited with code {exit_code}")
-                            # Show last part of log for debugging
-                            if log_content:
-                                self.log(f"Last log entries: {log_content[-1000:]}")
-                            return False
-                        else:
-                            # Exit code 0 but no completion message - might be OK, but log warning
-                            self.log("WARNING: Automation process finished but completion message not found")
-                            return False
-            
-            # Check log file for completion message
-            if Path("/tmp/automate-ibgateway.log").exists():
-                log_content = Path("/tmp/automate-ibgateway.log").read_text()
-                if "Configuration Complete" in log_content:
+        log_path = "/tmp/automate-ibgateway.log"
+        completion_log = self._log_watcher(log_path, "Configuration Complete")
+        # Readable as soon as the automation process exits, so a crash wakes the wait
+        exit_fd = _pidfd_open(self.automation_process.pid) if self.automation_process else None
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                # Check log file for completion message
+                if completion_log.found():
                     self.log("✓ Automation completed")
                     return True
-            
-            time.sleep(1)
-        
-        # Timeout reached
-        # Final check
-        if Path("/tmp/automate-ibgateway.log").exists():
-            log_content = Path("/tmp/automate-ibgateway.log").read_text()
-            if "Configuration Complete" in log_content:
-                self.log("✓ Automation completed")
-                return True
+                
+                # Check if process crashed
+                if self.automation_process and self.automation_process.poll() is not None:
+                    exit_code = self.automation_process.returncode
+                    # Process finished; pick up anything written just before exit
+                    if completion_log.found():
+                        self.log("✓ Automation completed")
+                        return True
+                    # Process exited but didn't complete - check exit code
+                    if exit_code != 0:
+                        self.log(f"ERROR: Automation process exited with code {exit_code}")
+                        # Show last part of log for debugging
+                        log_tail = _read_log_tail(log_path, 1000)
+                        if log_tail:
+                            self.log(f"Last log entries: {log_tail}")
+                        return False
+                    # Exit code 0 but no completion message - might be OK, but log warning
+                    self.log("WARNING: Automation process finished but completion message not found")
+                    return False
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Wakes on the next log write or process exit; the 1s cap covers
+                # systems without inotify or pidfd
+                completion_log.wait(min(1.0, remaining), () if exit_fd is None else (exit_fd,))
+        finally:
+            if exit_fd is not None:
+                os.close(exit_fd)
         
         self.log(f"ERROR: Automation did not complete within {timeout}s timeout")
-        if Path("/tmp/automate-ibgateway.log").exists():
-            log_content = Path("/tmp/automate-ibgateway.log").read_text()
-            if log_content:
-                self.log(f"Last log entries: {log_content[-1000:]}")
+        log_tail = _read_log_tail(log_path, 1000)
+        if log_tail:
+            self.log(f"Last log entries: {log_tail}")
         return False
     
     def _wait_for_port_forwarding(self, timeout: int = 30) -> bool:
         """Wait for port forwarding to be ready."""
         self.log("Waiting for port forwarding to be ready...")
         
+        forwarder = self.port_forwarder or PortForwarder(self.config, self.verbose)
         for i in range(timeout):
-            try:
-                result = subprocess.run(
-                    ["netstat", "-tlnp"],
-                    capture_output=True,
-                    text=True
-                )
-                output = result.stdout if result.returncode == 0 else ""
-                
-                # Try ss as fallback
-                if not output:
-                    result = subprocess.run(
-                        ["ss", "-tlnp"],
-                        capture_output=True,
-                        text=True
-                    )
-                    output = result.stdout if result.returncode == 0 else ""
-                
-                if ":4003 " in output and ":4004 " in output:
-                    self.log("✓ Port forwarding is ready")
-                    return True
-            except Exception:
-                pass
+            if forwarder.forwarding_ready():
+                self.log("✓ Port forwarding is ready")
+                return True
             
             time.sleep(1)
         
@@ -192,26 +236,115 @@ class ServiceOrchestrator:
         self.log("")
         self.log("=== Verifying all services ===")
         
+        forwarder = self.port_forwarder or PortForwarder(self.config, self.verbose)
+        
+        # Run the readiness checks side by side so a failing service costs one
+        # 1s timeout in total rather than one each. The screenshot and port
+        # forwarding checks are the bare probes, not the logging waits, so no
+        # "Waiting..." lines interleave with the summary.
+        async def check_services():
+            loop = asyncio.get_running_loop()
+            return await asyncio.gather(
+                self.vnc.wait_for_ready_async(timeout=1),
+                self.novnc.wait_for_ready_async(timeout=1),
+                loop.run_in_executor(None, _wait, self._probe_screenshot_service, 1),
+                _wait_async(lambda: forwarder.forwarding_ready() or None, 1),
+            )
+        
         xvfb_ready = self.xvfb.process and self.xvfb.process.poll() is None
-        vnc_ready = self.vnc.wait_for_ready(timeout=1)
-        novnc_ready = self.novnc.wait_for_ready(timeout=1)
-        screenshot_ready = self._wait_for_screenshot_service(timeout=1)
-        port_forward_ready = self._wait_for_port_forwarding(timeout=1)
+        vnc_ready, novnc_ready, screenshot_ready, port_forward_ready = asyncio.run(check_services())
         
         automation_ready = False
         if Path("/tmp/automate-ibgateway.log").exists():
-            log_content = Path("/tmp/automate-ibgateway.log").read_text()
-            automation_ready = "Configuration Complete" in log_content or (
+            automation_ready = self._scan_new("/tmp/automate-ibgateway.log", "Configuration Complete") or (
                 self.automation_process and self.automation_process.poll() is not None
             )
         
-        self.log(f"{'✓' if xvfb_ready else '✗'} Xvfb: {'Ready' if xvfb_ready else 'Not ready'}")
-        self.log(f"{'✓' if vnc_ready else '✗'} VNC: {'Ready' if vnc_ready else 'Not ready'}")
-        self.log(f"{'✓' if novnc_ready else '✗'} noVNC: {'Ready' if novnc_ready else 'Not ready'}")
-        self.log(f"{'✓' if screenshot_ready else '✗'} Screenshot service: {'Ready' if screenshot_ready else 'Not ready'}")
-        self.log(f"{'✓' if port_forward_ready else '✗'} Port forwarding: {'Ready' if port_forward_ready else 'Not ready'}")
-        self.log(f"{'✓' if automation_ready else '✗'} Automation: {'Complete' if automation_ready else 'Not complete'}")
+        statuses = (
+            ("Xvfb", xvfb_ready, "Ready", "Not ready"),
+            ("VNC", vnc_ready, "Ready", "Not ready"),
+            ("noVNC", novnc_ready, "Ready", "Not ready"),
+            ("Screenshot service", screenshot_ready, "Ready", "Not ready"),
+            ("Port forwarding", port_forward_ready, "Ready", "Not ready"),
+            ("Automation", automation_ready, "Complete", "Not complete"),
+        )
+        # One write, so the summary can't interleave with the log tailer's output
+        print(
+            "\n".join(
+                f"[ORCHESTRATOR] {'✓' if ready else '✗'} {name}: {ok if ready else not_ok}"
+                for name, ready, ok, not_ok in statuses
+            ),
+            flush=True,
+        )
     
+    def _start_display_services(self) -> bool:
+        """Start Xvfb, the window manager, VNC and noVNC.
+
+        On failure VNC and noVNC are stopped, so no websockify/x11vnc child
+        or pending startup worker outlives the failed start.
+        """
+        # VNC and noVNC are brought up in the background while the display is
+        # prepared. websockify only dials the VNC port when a client connects,
+        # so it can start right away; x11vnc needs Xvfb first.
+        executor = ThreadPoolExecutor(max_workers=2)
+        novnc_future = executor.submit(self._start_service, self.novnc)
+        vnc_future = None
+        started = False
+        try:
+            # Start Xvfb
+            if not self.xvfb.start():
+                return False
+            if not self.xvfb.wait_for_ready():
+                return False
+        
+            # Start VNC
+            vnc_future = executor.submit(self._start_service, self.vnc)
+        
+            # Start window manager
+            self.window_manager.start()
+
+            # One handler takes both startup screenshots below.
+            screenshotter = ScreenshotHandler(self.config, verbose=self.verbose)
+
+            # Capture "initial state" screenshot (with xterm window present).
+            # This is helpful for CI artifact debugging and should be best-effort.
+            try:
+                time.sleep(1)  # give xterm a moment to render
+                screenshotter.take_screenshot(os.path.join(self.config.screenshot_dir, "initial_state.png"))
+            except Exception as e:
+                self.log(f"WARNING: Failed to capture initial_state screenshot: {e}")
+
+            # The current "window manager" implementation launches an xterm; close it
+            # so it doesn't obstruct the IBGateway UI in VNC/noVNC.
+            try:
+                self.window_manager.close_terminal_windows()
+            except Exception as e:
+                self.log(f"ERROR: Failed to close terminal window before starting IB Gateway: {e}")
+                return False
+
+            # Capture screenshot after closing the terminal window.
+            try:
+                time.sleep(0.5)
+                screenshotter.take_screenshot(os.path.join(self.config.screenshot_dir, "after_close_terminal.png"))
+            except Exception as e:
+                self.log(f"WARNING: Failed to capture after_close_terminal screenshot: {e}")
+        
+            # Wait for both VNC and noVNC before judging either
+            started = all([vnc_future.result(), novnc_future.result()])
+            return started
+        finally:
+            if started:
+                executor.shutdown()
+            else:
+                # cancel_futures=True needs Python 3.9. A start still in flight
+                # is stopped again once it finishes, so it can't leak a child.
+                for future, manager in ((novnc_future, self.novnc), (vnc_future, self.vnc)):
+                    manager.stop()
+                    if future is not None:
+                        future.cancel()
+                        future.add_done_callback(lambda _, manager=manager: manager.stop())
+                executor.shutdown(wait=False)
+
     def start(self, skip_automation: bool = False) -> int:
         """Start all services.
         
@@ -231,50 +364,7 @@ class ServiceOrchestrator:
         # Start log tailing
         self._start_log_tailing()
         
-        # Start Xvfb
-        if not self.xvfb.start():
-            return 1
-        if not self.xvfb.wait_for_ready():
-            return 1
-        
-        # Start window manager
-        self.window_manager.start()
-
-        # Capture "initial state" screenshot (with xterm window present).
-        # This is helpful for CI artifact debugging and should be best-effort.
-        try:
-            time.sleep(1)  # give xterm a moment to render
-            screenshotter = ScreenshotHandler(self.config, verbose=self.verbose)
-            screenshotter.take_screenshot(os.path.join(self.config.screenshot_dir, "initial_state.png"))
-        except Exception as e:
-            self.log(f"WARNING: Failed to capture initial_state screenshot: {e}")
-
-        # The current "window manager" implementation launches an xterm; close it
-        # so it doesn't obstruct the IBGateway UI in VNC/noVNC.
-        try:
-            self.window_manager.close_terminal_windows()
-        except Exception as e:
-            self.log(f"ERROR: Failed to close terminal window before starting IB Gateway: {e}")
-            return 1
-
-        # Capture screenshot after closing the terminal window.
-        try:
-            time.sleep(0.5)
-            screenshotter = ScreenshotHandler(self.config, verbose=self.verbose)
-            screenshotter.take_screenshot(os.path.join(self.config.screenshot_dir, "after_close_terminal.png"))
-        except Exception as e:
-            self.log(f"WARNING: Failed to capture after_close_terminal screenshot: {e}")
-        
-        # Start VNC
-        if not self.vnc.start():
-            return 1
-        if not self.vnc.wait_for_ready():
-            return 1
-        
-        # Start noVNC
-        if not self.novnc.start():
-            return 1
-        if not self.novnc.wait_for_ready():
+        if not self._start_display_services():
             return 1
         
         # Debug: Show environment
@@ -285,10 +375,12 @@ class ServiceOrchestrator:
         
         # Start IB Gateway
         self.log("=== Starting IB Gateway ===")
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        # One environment for every child started below: the X display, and
+        # unbuffered output for the Python ones (-u only covers the interpreter
+        # we start; this also reaches any Python it spawns)
+        env = {**self.config.display_env, "PYTHONUNBUFFERED": "1"}
         try:
-            self.ibgateway_process = subprocess.Popen(
+            self.ibgateway_process = _spawn(
                 ["/opt/ibgateway/ibgateway"],
                 env=env
             )
@@ -304,15 +396,8 @@ class ServiceOrchestrator:
             self.log(f"ERROR: Failed to start IB Gateway: {e}")
             return 1
         
-        # Determine CLI script path (needed for both automation and screenshot server)
-        # Try /ibgateway_manager_cli.py first (Docker container path), then fallback to script location
-        cli_script = "/ibgateway_manager_cli.py"
-        if not Path(cli_script).exists():
-            # Try to find it relative to this module
-            script_dir = Path(__file__).resolve().parent.parent.parent
-            potential_path = script_dir / "ibgateway_manager_cli.py"
-            if potential_path.exists():
-                cli_script = str(potential_path)
+        # CLI script path (needed for both automation and screenshot server)
+        cli_script = _find_cli_script()
         
         if skip_automation:
             self.log("=== Skipping automation (--no-automation flag set) ===")
@@ -320,11 +405,12 @@ class ServiceOrchestrator:
             
             # Start automation in background
             try:
-                with open("/tmp/automate-ibgateway.log", "w") as log_f:
-                    self.automation_process = subprocess.Popen(
+                with _open_child_log("/tmp/automate-ibgateway.log") as log_f:
+                    self.automation_process = _spawn(
                         [sys.executable, "-u", cli_script, "automate-ibgateway"],
                         stdout=log_f,
-                        stderr=subprocess.STDOUT
+                        stderr=subprocess.STDOUT,
+                        env=env
                     )
                 self.log(f"Automation script started (PID: {self.automation_process.pid})")
             except Exception as e:
@@ -334,17 +420,26 @@ class ServiceOrchestrator:
         # Start screenshot HTTP server in background
         self.log(f"=== Starting screenshot HTTP server on port {self.config.screenshot_port} ===")
         try:
-            with open("/tmp/screenshot-server.log", "w") as log_f:
-                self.screenshot_process = subprocess.Popen(
+            with _open_child_log("/tmp/screenshot-server.log") as log_f:
+                self.screenshot_process = _spawn(
                     [sys.executable, "-u", cli_script, "screenshot-server", "--port", str(self.config.screenshot_port)],
                     stdout=log_f,
-                    stderr=subprocess.STDOUT
+                    stderr=subprocess.STDOUT,
+                    env=env
                 )
             self.log(f"Screenshot server started (PID: {self.screenshot_process.pid})")
         except Exception as e:
             self.log(f"ERROR: Failed to start screenshot server: {e}")
             return 1
         
+        # Serve cached healthcheck results so Docker's HEALTHCHECK can skip
+        # starting Python; it falls back to the one-shot check if this fails.
+        try:
+            self.healthcheck_daemon = healthcheck_daemon.start_from_env()
+            self.log(f"Healthcheck daemon listening on {self.healthcheck_daemon.socket_path}")
+        except Exception as e:
+            self.log(f"WARNING: Failed to start healthcheck daemon: {e}")
+        
         if not self._wait_for_screenshot_service():
             return 1
         
@@ -352,10 +447,9 @@ class ServiceOrchestrator:
         if self.screenshot_process and self.screenshot_process.poll() is not None:
             exit_code = self.screenshot_process.returncode
             self.log(f"ERROR: Screenshot server process exited with code {exit_code}")
-            if Path("/tmp/screenshot-server.log").exists():
-                log_content = Path("/tmp/screenshot-server.log").read_text()
-                if log_content:
-                    self.log(f"Screenshot server log: {log_content[-1000:]}")
+            log_tail = _read_log_tail("/tmp/screenshot-server.log", 1000)
+            if log_tail:
+                self.log(f"Screenshot server log: {log_tail}")
             return 1
         
         # Wait for automation to complete (only if automation was started)
@@ -365,7 +459,7 @@ class ServiceOrchestrator:
                 return 1
         
         # Start port forwarding in background
-        self.log("=== Starting socat port forwarding ===")
+        self.log("=== Starting port forwarding ===")
         self.port_forwarder = PortForwarder(self.config, self.verbose)
         if not self.port_forwarder.start_background():
             self.log("ERROR: Port forwarding failed to start")
@@ -382,13 +476,14 @@ class ServiceOrchestrator:
         self.log("")
         self.log("=== All services ready ===")
         
-        # Keep running - wait for tail process or processes
+        # Keep running - wait for log tailer or processes
         try:
-            # Wait for tail process (which will run until killed)
-            if self.tail_process:
-                self.tail_process.wait()
+            # Wait for log tailer (which will run until stopped)
+            if self.log_tailer:
+                while self.log_tailer.is_alive():
+                    self.log_tailer.join(timeout=1)
             else:
-                # If no tail process, wait for IB Gateway
+                # If no log tailer, wait for IB Gateway
                 if self.ibgateway_process:
                     self.ibgateway_process.wait()
         except KeyboardInterrupt:
@@ -400,50 +495,27 @@ class ServiceOrchestrator:
         """Clean up all processes on exit."""
         self.log("Shutting down services...")
         
-        # Stop all processes
-        if self.ibgateway_process:
-            try:
-                self.ibgateway_process.terminate()
-            except Exception:
-                pass
-        
-        if self.automation_process:
-            try:
-                self.automation_process.terminate()
-            except Exception:
-                pass
-        
-        if self.screenshot_process:
-            try:
-                self.screenshot_process.terminate()
-            except Exception:
-                pass
-        
+        # Stop all processes together
+        processes = [
+            self.ibgateway_process,
+            self.automation_process,
+            self.screenshot_process,
+            self.novnc.process,
+            self.vnc.process,
+            self.window_manager.process,
+            self.xvfb.process,
+        ]
+        shutdown_all(processes)
         if self.port_forwarder:
-            try:
-                for process in self.port_forwarder.processes:
-                    try:
-                        process.terminate()
-                        process.wait(timeout=5)
-                    except Exception:
-                        try:
-                            process.kill()
-                        except Exception:
-                            pass
-            except Exception:
-                pass
-        
-        if self.tail_process:
-            try:
-                self.tail_process.terminate()
-            except Exception:
-                pass
-        
-        # Stop service managers
-        self.novnc.stop()
-        self.vnc.stop()
-        self.window_manager.stop()
-        self.xvfb.stop()
+            self.port_forwarder.stop()
+        if self.healthcheck_daemon:
+            self.healthcheck_daemon.stop()
+        for watcher in self._log_watchers.values():
+            watcher.close()
+        if self._screenshot_probe:
+            self._screenshot_probe.close()
+        if self.log_tailer:
+            self.log_tailer.stop()
         
         sys.exit(0)
 
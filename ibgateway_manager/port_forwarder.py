@@ -1,17 +1,103 @@
 """
-Port forwarding functionality using socat.
+Port forwarding functionality using an in-process asyncio TCP proxy.
 """
 
+import asyncio
+import functools
 import signal
-import subprocess
+import socket
+import threading
 import time
-from typing import List
+from typing import List, Optional
 
 from .config import Config
+from .services import _is_listening, _listening_ports
+
+
+class _Relay(asyncio.Protocol):
+    """One side of a forwarded connection; writes everything it receives to its peer.
+    
+    Data goes from the loop's recv callback straight into the peer transport's
+    write(), which sends immediately when the socket buffer has room, so each
+    chunk costs one recv and one send with no coroutine switches in between.
+    Flow control is passed across: when the peer's send buffer fills, this side
+    stops reading until it drains. Both sockets get TCP_NODELAY and SO_KEEPALIVE.
+    """
+    
+    def __init__(self, peer: Optional["_Relay"] = None):
+        self.transport: Optional[asyncio.Transport] = None
+        self.peer = peer
+        self.eof = False
+    
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            # Small API messages go out without Nagle delay; keepalive notices
+            # peers that vanished from idle long-lived API sessions
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    
+    def data_received(self, data):
+        self.peer.transport.write(data)
+    
+    def eof_received(self):
+        self.eof = True
+        if self.peer.eof:
+            self.transport.close()
+            self.peer.transport.close()
+            return False
+        if self.peer.transport.can_write_eof():
+            self.peer.transport.write_eof()
+        # Keep the other direction open until the peer finishes too
+        return True
+    
+    def connection_lost(self, exc):
+        if self.peer and self.peer.transport:
+            self.peer.transport.close()
+    
+    def pause_writing(self):
+        if self.peer:
+            self.peer.transport.pause_reading()
+    
+    def resume_writing(self):
+        if self.peer:
+            self.peer.transport.resume_reading()
+
+
+class _ClientRelay(_Relay):
+    """Accepted side of a forwarded connection; dials 127.0.0.1:target_port on connect."""
+    
+    def __init__(self, target_port: int, log):
+        super().__init__()
+        self.target_port = target_port
+        self.log = log
+    
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        # Hold client bytes in the kernel until the upstream side exists
+        transport.pause_reading()
+        asyncio.ensure_future(self._connect_upstream())
+    
+    async def _connect_upstream(self):
+        loop = asyncio.get_event_loop()
+        try:
+            _, upstream = await loop.create_connection(
+                lambda: _Relay(peer=self), "127.0.0.1", self.target_port
+            )
+        except OSError as e:
+            self.log(f"Connection to 127.0.0.1:{self.target_port} failed: {e}")
+            self.transport.close()
+            return
+        if self.transport.is_closing():
+            upstream.transport.close()
+            return
+        self.peer = upstream
+        self.transport.resume_reading()
 
 
 class PortForwarder:
-    """Handles port forwarding using socat."""
+    """Forwards the externally exposed ports to IB Gateway's localhost-only ports."""
     
     def __init__(self, config: Config, verbose: bool = False):
         self.config = config
@@ -20,7 +106,9 @@ class PortForwarder:
         self.paper_port = 4002
         self.forward_live_port = 4003
         self.forward_paper_port = 4004
-        self.processes: List[subprocess.Popen] = []
+        self.servers: List[asyncio.AbstractServer] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
     
     def log(self, message: str):
         """Print log message."""
@@ -29,24 +117,19 @@ class PortForwarder:
     
     def check_port_listening(self, port: int) -> bool:
         """Check if a port is listening."""
-        try:
-            result = subprocess.run(
-                ["netstat", "-tlnp"],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                return f":{port} " in result.stdout
-            
-            # Try ss as fallback
-            result = subprocess.run(
-                ["ss", "-tlnp"],
-                capture_output=True,
-                text=True
-            )
-            return f":{port} " in result.stdout
-        except Exception:
-            return False
+        return _is_listening(port)
+    
+    def ports_listening(self, *ports: int) -> bool:
+        """Check several ports against a single /proc/net/tcp snapshot."""
+        return set(ports) <= _listening_ports()
+    
+    def forwarding_ready(self) -> bool:
+        """Check that both forwarded ports are listening."""
+        if self.servers:
+            # The listeners live in this process, so their own state answers
+            # without reading /proc
+            return all(server.is_serving() for server in self.servers)
+        return self.ports_listening(self.forward_live_port, self.forward_paper_port)
     
     def wait_for_ports(self, timeout: int = 60) -> bool:
         """Wait for IB Gateway ports to be available."""
@@ -54,7 +137,7 @@ class PortForwarder:
         
         elapsed = 0
         while elapsed < timeout:
-            if self.check_port_listening(self.live_port) and self.check_port_listening(self.paper_port):
+            if self.ports_listening(self.live_port, self.paper_port):
                 self.log("✓ IB Gateway ports are ready")
                 return True
             
@@ -64,46 +147,39 @@ class PortForwarder:
         self.log(f"WARNING: IB Gateway ports not available after {timeout}s, starting forwarding anyway")
         return False
     
+    async def _start_servers(self):
+        """Bind both forwarding listeners on the proxy event loop."""
+        for listen_port, target_port in (
+            (self.forward_live_port, self.live_port),
+            (self.forward_paper_port, self.paper_port),
+        ):
+            server = await self._loop.create_server(
+                functools.partial(_ClientRelay, target_port, self.log),
+                "0.0.0.0", listen_port, reuse_address=True, backlog=512
+            )
+            self.servers.append(server)
+    
     def start_background(self) -> bool:
-        """Start socat port forwarding in background mode (non-blocking)."""
-        self.log("--- Starting socat port forwarding ---")
+        """Start port forwarding on a background event loop thread (non-blocking)."""
+        self.log("--- Starting port forwarding ---")
         self.log(f"Forwarding {self.forward_live_port} -> 127.0.0.1:{self.live_port} (Live Trading)")
         self.log(f"Forwarding {self.forward_paper_port} -> 127.0.0.1:{self.paper_port} (Paper Trading)")
         
         # Wait for ports (non-blocking, will start anyway)
         # self.wait_for_ports()
         
-        # Start Live Trading forwarding
-        self.log(f"Starting socat forwarding for Live Trading ({self.forward_live_port} -> 127.0.0.1:{self.live_port})...")
-        try:
-            live_process = subprocess.Popen(
-                ["socat", f"TCP-LISTEN:{self.forward_live_port},fork,reuseaddr", f"TCP:127.0.0.1:{self.live_port}"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            self.processes.append(live_process)
-            self.log(f"✓ Live Trading forwarding started (PID: {live_process.pid})")
-        except Exception as e:
-            self.log(f"ERROR: Failed to start Live Trading forwarding: {e}")
-            return False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="port-forward", daemon=True)
+        self._thread.start()
         
-        # Start Paper Trading forwarding
-        self.log(f"Starting socat forwarding for Paper Trading ({self.forward_paper_port} -> 127.0.0.1:{self.paper_port})...")
         try:
-            paper_process = subprocess.Popen(
-                ["socat", f"TCP-LISTEN:{self.forward_paper_port},fork,reuseaddr", f"TCP:127.0.0.1:{self.paper_port}"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            self.processes.append(paper_process)
-            self.log(f"✓ Paper Trading forwarding started (PID: {paper_process.pid})")
+            asyncio.run_coroutine_threadsafe(self._start_servers(), self._loop).result(timeout=10)
         except Exception as e:
-            self.log(f"ERROR: Failed to start Paper Trading forwarding: {e}")
+            self.log(f"ERROR: Failed to start port forwarding: {e}")
+            self.stop()
             return False
         
-        # Verify forwarding
-        time.sleep(1)
-        if self.check_port_listening(self.forward_live_port) and self.check_port_listening(self.forward_paper_port):
+        if self.ports_listening(self.forward_live_port, self.forward_paper_port):
             self.log("✓ Port forwarding is active")
             self.log(f"  - Live Trading: 0.0.0.0:{self.forward_live_port} -> 127.0.0.1:{self.live_port}")
             self.log(f"  - Paper Trading: 0.0.0.0:{self.forward_paper_port} -> 127.0.0.1:{self.paper_port}")
@@ -113,7 +189,7 @@ class PortForwarder:
         return True
     
     def start_forwarding(self) -> int:
-        """Start socat port forwarding (blocking mode for standalone use)."""
+        """Start port forwarding (blocking mode for standalone use)."""
         if not self.start_background():
             return 1
         
@@ -123,25 +199,34 @@ class PortForwarder:
         signal.signal(signal.SIGTERM, self._cleanup)
         signal.signal(signal.SIGINT, self._cleanup)
         
-        # Keep running
+        # Keep running until stop() ends the event loop
         try:
-            for process in self.processes:
-                process.wait()
+            while self._thread and self._thread.is_alive():
+                self._thread.join(timeout=1)
         except KeyboardInterrupt:
             self._cleanup(None, None)
         
         return 0
     
+    def stop(self):
+        """Close the listeners and stop the proxy event loop."""
+        loop, thread = self._loop, self._thread
+        if loop is None:
+            return
+        
+        # Stop accepting first; in-flight connections end with the loop.
+        for server in self.servers:
+            loop.call_soon_threadsafe(server.close)
+        self.servers = []
+        loop.call_soon_threadsafe(loop.stop)
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+        self._loop = None
+        self._thread = None
+    
     def _cleanup(self, signum, frame):
-        """Clean up processes on exit."""
-        self.log("Cleaning up port forwarding processes...")
-        for process in self.processes:
-            try:
-                process.terminate()
-                process.wait(timeout=5)
-            except Exception:
-                try:
-                    process.kill()
-                except Exception:
-                    pass
-
+        """Stop forwarding on exit."""
+        self.log("Cleaning up port forwarding...")
+        self.stop()
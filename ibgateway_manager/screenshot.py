@@ -2,19 +2,45 @@
 Screenshot handling functionality.
 """
 
+import functools
+import hashlib
+import importlib.util
+import io
 import os
+import select
+import shutil
 import subprocess
+import threading
 import time
 import glob
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Iterable, Tuple
 
 try:
-    from PIL import Image, ImageChops, ImageStat
+    from PIL import Image, ImageChops
     HAS_PIL = True
 except ImportError:  # pragma: no cover
     HAS_PIL = False
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover
+    HAS_NUMPY = False
+
+# Importing Numba (and llvmlite) takes far longer than everything else here, so
+# only check that it is installed; _diff_kernel() imports it on first comparison.
+HAS_NUMBA = importlib.util.find_spec("numba") is not None
+
+try:
+    from Xlib import X
+    from Xlib import display as xdisplay
+    from Xlib.ext import damage as xdamage
+    HAS_XLIB = True
+except ImportError:  # pragma: no cover
+    HAS_XLIB = False
+
 from .config import Config
+from .services import _spawn
 
 
 class ScreenshotHandler:
@@ -23,6 +49,30 @@ class ScreenshotHandler:
     def __init__(self, config: Config, verbose: bool = False):
         self.config = config
         self.verbose = verbose
+        # Persistent in-process screen grabber for capture_image(); opened on first
+        # use, and not retried once it has failed.
+        self._grabber: Optional["_ScreenGrabber"] = None
+        self._grabber_failed = False
+        # The screenshot server shares one handler between request threads, and an
+        # Xlib Display isn't thread-safe: grabs are serialized on this lock.
+        self._grabber_lock = threading.Lock()
+        # Decoded reference images by path, with the mtime they were decoded at.
+        self._references: Dict[str, Tuple[int, "Image.Image"]] = {}
+        # Next scrot-style number to try per output path, so repeated captures to
+        # the same name don't re-probe every earlier _NNN file.
+        self._next_number: Dict[str, int] = {}
+        # Held while a numbered name is picked and written, so two concurrent
+        # captures can't claim the same one.
+        self._save_lock = threading.Lock()
+        # time.monotonic() of the last sidecar sweep; None until the first one.
+        self._last_prune: Optional[float] = None
+        # Screenshot tool for the subprocess fallback; PATH doesn't change under us.
+        if self._command_exists("scrot"):
+            self._tool: Optional[str] = "scrot"
+        elif self._command_exists("import"):
+            self._tool = "import"
+        else:
+            self._tool = None
     
     def log(self, message: str):
         """Print log message."""
@@ -50,7 +100,7 @@ class ScreenshotHandler:
         return True
     
     def take_screenshot(self, output_path: Optional[str] = None) -> Optional[str]:
-        """Take a screenshot using scrot or imagemagick."""
+        """Take a screenshot, read directly from the X display or with scrot/imagemagick."""
         os.makedirs(self.config.screenshot_dir, exist_ok=True)
         
         # Generate default output path if not provided
@@ -61,39 +111,63 @@ class ScreenshotHandler:
             if not self.validate_path(output_path):
                 return None
         
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        # Read the pixels over the persistent X connection when possible; that
+        # skips forking a screenshot tool for every capture.
+        frame = self.capture_image()
+        if frame is not None:
+            return self._save_captured(frame, output_path)
+        
+        env = self.config.display_env
         
         # Try scrot first, then imagemagick
-        if self._command_exists("scrot"):
+        if self._tool == "scrot":
             self.log("Taking screenshot with scrot...")
             cmd = ["scrot", "-z", output_path]
-        elif self._command_exists("import"):
+        elif self._tool == "import":
             self.log("Taking screenshot with imagemagick...")
             cmd = ["import", "-window", "root", output_path]
         else:
             self.log("ERROR: No screenshot tool available (scrot or imagemagick)")
             return None
         
+        # scrot -z writes to the first free base_NNN name when the target exists;
+        # work out which one up front instead of scanning the directory afterwards.
+        expected_path = output_path
+        if self._tool == "scrot" and os.path.exists(output_path):
+            with self._save_lock:
+                expected_path = self._next_numbered_path(output_path)
+        
         try:
-            result = subprocess.run(
+            # posix_spawn rather than fork: no copy of this process's page tables
+            proc = _spawn(
                 cmd,
-                capture_output=True,
-                text=True,
-                env=env,
-                timeout=10
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                env=env
             )
+            try:
+                _, stderr = proc.communicate(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                raise
             
-            if result.returncode == 0:
-                # Small delay to ensure file system sync (especially for numbered versions)
-                time.sleep(0.1)
+            if proc.returncode == 0:
+                # The tool has exited, so its file is fully written and visible;
+                # no settling delay is needed before looking for it.
+                if expected_path != output_path and os.path.exists(expected_path):
+                    self.log(f"Screenshot saved to: {expected_path} (numbered version)")
+                    self._write_sidecars(expected_path)
+                    return expected_path
                 
                 # When using scrot with -z flag, if file exists it creates numbered versions
                 # Numbered versions are always newer, so check for them first
-                if self._command_exists("scrot"):
+                if self._tool == "scrot" and expected_path != output_path:
                     numbered_path = self._find_numbered_screenshot(output_path)
                     if numbered_path and os.path.exists(numbered_path):
                         self.log(f"Screenshot saved to: {numbered_path} (numbered version)")
+                        self._write_sidecars(numbered_path)
                         return numbered_path
                     elif self.verbose:
                         self.log(f"No numbered screenshot found, checking exact path: {output_path}")
@@ -101,24 +175,109 @@ class ScreenshotHandler:
                 # Fall back to exact path (first time screenshot or imagemagick)
                 if os.path.exists(output_path):
                     self.log(f"Screenshot saved to: {output_path} (exact path)")
+                    self._write_sidecars(output_path)
                     return output_path
                 
                 # If we get here, screenshot command succeeded but file not found
                 self.log(f"ERROR: Screenshot command succeeded but file not found at: {output_path}")
                 return None
             else:
-                self.log(f"ERROR: Screenshot failed: {result.stderr}")
+                self.log(f"ERROR: Screenshot failed: {stderr.decode('utf-8', 'replace')}")
                 return None
         except Exception as e:
             self.log(f"ERROR: Error taking screenshot: {e}")
             return None
     
+    def _save_captured(self, frame: "Image.Image", output_path: str) -> Optional[str]:
+        """Save a captured frame without overwriting, numbering it like scrot does."""
+        digest = None
+        with self._save_lock:
+            path = self._next_numbered_path(output_path) if os.path.exists(output_path) else output_path
+            try:
+                if self.config.save_raw_screenshots:
+                    # Encode in memory so the digest sidecar is hashed from these
+                    # bytes rather than by reading the file back.
+                    buf = io.BytesIO()
+                    frame.save(buf, format="PNG", compress_level=_FRAME_PNG_COMPRESSION)
+                    with open(path, "wb") as f:
+                        f.write(buf.getbuffer())
+                    digest = hashlib.sha256(buf.getbuffer()).hexdigest()
+                else:
+                    frame.save(path, compress_level=_FRAME_PNG_COMPRESSION)
+            except Exception as e:
+                self.log(f"ERROR: Error saving screenshot: {e}")
+                return None
+        self.log(f"Screenshot saved to: {path}")
+        self._write_sidecars(path, digest, frame)
+        return path
+    
+    def _next_numbered_path(self, output_path: str) -> str:
+        """Return the first free scrot-style ``base_NNN.ext`` path for output_path."""
+        base, extension = os.path.splitext(output_path)
+        n = self._next_number.get(output_path, 0)
+        while os.path.exists(f"{base}_{n:03d}{extension}"):
+            n += 1
+        self._next_number[output_path] = n + 1
+        return f"{base}_{n:03d}{extension}"
+    
+    def _write_sidecars(
+        self, image_path: str, digest: Optional[str] = None, frame: Optional["Image.Image"] = None
+    ) -> None:
+        """Write the digest and raw pixel sidecars for a new screenshot.
+
+        Disabled unless SCREENSHOT_SAVE_RAW is set. digest and frame are the
+        image's SHA-256 and pixels when the caller already has them, so the file
+        needn't be read back. Failures are logged and ignored.
+        """
+        if not self.config.save_raw_screenshots:
+            return
+        try:
+            if digest is None:
+                digest = _file_sha256(image_path)
+            with open(image_path + ".sha256", "w") as f:
+                f.write(digest)
+        except OSError as e:
+            self.log(f"WARNING: Could not write digest sidecar for {image_path}: {e}")
+        self._write_raw_sidecar(image_path, frame)
+        now = time.monotonic()
+        with self._save_lock:
+            due = self._last_prune is None or now - self._last_prune >= _SIDECAR_PRUNE_INTERVAL
+            if due:
+                self._last_prune = now
+        if due:
+            self._prune_sidecars()
+
+    def _write_raw_sidecar(self, image_path: str, frame: Optional["Image.Image"] = None) -> None:
+        """Persist decoded RGB pixels next to a screenshot as ``<image>.npy``.
+
+        compare_images_pil memory-maps the sidecar instead of decoding the PNG.
+        The PNG is only decoded here when frame isn't given.
+        """
+        if not (HAS_NUMPY and HAS_PIL):
+            return
+        try:
+            if frame is not None:
+                np.save(image_path + ".npy", np.asarray(frame if frame.mode == "RGB" else frame.convert("RGB")))
+            else:
+                with Image.open(image_path) as img:
+                    np.save(image_path + ".npy", np.asarray(img.convert("RGB")))
+        except Exception as e:
+            self.log(f"WARNING: Could not write raw sidecar for {image_path}: {e}")
+
+    def _prune_sidecars(self) -> None:
+        """Delete ``.npy`` and ``.sha256`` sidecars older than the configured retention."""
+        cutoff = time.time() - self.config.raw_retention_minutes * 60
+        for pattern in ("*.npy", "*.sha256"):
+            for sidecar in glob.glob(os.path.join(self.config.screenshot_dir, pattern)):
+                try:
+                    if os.path.getmtime(sidecar) < cutoff:
+                        os.remove(sidecar)
+                except OSError:
+                    pass
+
     def _command_exists(self, command: str) -> bool:
         """Check if a command exists in PATH."""
-        return subprocess.run(
-            ["which", command],
-            capture_output=True
-        ).returncode == 0
+        return _command_in_path(command)
     
     def _find_numbered_screenshot(self, output_path: str) -> Optional[str]:
         """Find numbered screenshot files created by scrot when file already exists.
@@ -142,15 +301,35 @@ class ScreenshotHandler:
         base_name_no_ext = os.path.splitext(base_name)[0]
         extension = os.path.splitext(base_name)[1]
         
-        # Pattern to match numbered versions: base_name_*.png
-        pattern = os.path.join(directory, f"{base_name_no_ext}_*{extension}")
+        # Numbered versions look like base_name_*.png
+        prefix = f"{base_name_no_ext}_"
+        pattern = os.path.join(directory, f"{prefix}*{extension}")
         
         if self.verbose:
             self.log(f"Searching for numbered screenshots with pattern: {pattern}")
         
-        matching_files = glob.glob(pattern)
+        # One directory pass; scandir entries carry their stat, so there is no
+        # separate getmtime call per match.
+        matching_files = []
+        latest = None
+        latest_mtime = -1.0
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if not (name.startswith(prefix) and name.endswith(extension)):
+                        continue
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    matching_files.append(entry.path)
+                    if mtime > latest_mtime:
+                        latest, latest_mtime = entry.path, mtime
+        except OSError:
+            pass
         
-        if not matching_files:
+        if latest is None:
             if self.verbose:
                 # List all files in directory for debugging
                 try:
@@ -162,19 +341,25 @@ class ScreenshotHandler:
             return None
         
         # Return the most recently modified file
-        latest = max(matching_files, key=os.path.getmtime)
         if self.verbose:
             self.log(f"Found {len(matching_files)} numbered screenshot(s): {matching_files}")
-            self.log(f"Using latest: {latest} (mtime: {os.path.getmtime(latest)})")
+            self.log(f"Using latest: {latest} (mtime: {latest_mtime})")
         return latest
     
-    def compare_screenshots(self, img1_path: str, img2_path: str, threshold: float = 0.01) -> int:
+    def compare_screenshots(
+        self,
+        img1_path: str,
+        img2_path: str,
+        threshold: float = 0.01,
+        downsample: int = 1
+    ) -> int:
         """Compare two screenshots and return exit code.
         
         Args:
             img1_path: First image path
             img2_path: Second image path
             threshold: Similarity threshold
+            downsample: Box-average both images by this factor before comparing
             
         Returns:
             0 if images are different, 1 if similar, or error code
@@ -206,7 +391,13 @@ class ScreenshotHandler:
         
         # Pillow-based comparison (preferred). Fallback to file-size only if Pillow missing.
         try:
-            result = compare_images_pil(img1_path, img2_path, threshold=threshold, max_diff_percentage=1.0)
+            result = compare_images_pil(
+                img1_path,
+                img2_path,
+                threshold=threshold,
+                max_diff_percentage=1.0,
+                downsample=downsample,
+            )
             self.log("Image content comparison:")
             self.log(f"  Mean pixel difference: {result['mean_diff']:.2f}")
             self.log(f"  Max pixel difference: {result['max_diff']}")
@@ -262,7 +453,8 @@ class ScreenshotHandler:
         self.log("")
         
         self.log("--- Step 2: Comparing screenshots ---")
-        return self.compare_screenshots(test_image_path, current_screenshot_path, threshold)
+        # Only "did the screen change meaningfully" matters here, so compare at 1/4 scale.
+        return self.compare_screenshots(test_image_path, current_screenshot_path, threshold, downsample=4)
     
     def compare_with_reference(
         self,
@@ -290,6 +482,24 @@ class ScreenshotHandler:
             return False, None, None
         
         current_path = os.path.join(self.config.screenshot_dir, screenshot_filename)
+        frame = self.capture_image()
+        if frame is not None:
+            # Compare the in-memory frame; it is only encoded to disk afterwards.
+            try:
+                result = compare_images_pil(
+                    reference_path,
+                    None,
+                    threshold=threshold,
+                    max_diff_percentage=max_diff_percentage,
+                    reference=self._load_reference(reference_path),
+                    current=frame,
+                )
+            except Exception as e:
+                self.log(f"ERROR: Failed to compare screenshots: {e}")
+                self.log(f"Reference: {reference_path}")
+                return False, None, self._save_captured(frame, current_path)
+            return result["is_match"], result, self._save_captured(frame, current_path)
+        
         current = self.take_screenshot(current_path)
         if not current:
             self.log("ERROR: Failed to capture screenshot for comparison")
@@ -304,6 +514,78 @@ class ScreenshotHandler:
             self.log(f"Current:   {current}")
             return False, None, current
     
+    def _load_reference(self, path: str) -> "Image.Image":
+        """Return the decoded RGB reference at path, decoding only if it changed."""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._references.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        reference = load_reference_image(path)
+        self._references[path] = (mtime, reference)
+        return reference
+    
+    def preload_references(self, paths: Iterable[str]) -> None:
+        """Decode reference images ahead of time so the first state check doesn't pay for it.
+        
+        Files that are missing or fail to decode are logged and skipped.
+        """
+        if not HAS_PIL:
+            return
+        for path in paths:
+            try:
+                self._load_reference(str(path))
+            except Exception as e:
+                self.log(f"Could not preload reference {path}: {e}")
+    
+    def _open_change_watcher(self) -> Optional["_ScreenChangeWatcher"]:
+        """Return a DAMAGE-based screen change watcher, or None to poll on a timer."""
+        if not HAS_XLIB:
+            return None
+        try:
+            return _ScreenChangeWatcher(self.config.display)
+        except Exception as e:
+            self.log(f"Screen change events unavailable ({e}), polling instead")
+            return None
+    
+    def _save_frame(self, frame: "Image.Image", path: str):
+        """Write a captured frame to path, logging instead of raising on failure."""
+        try:
+            os.makedirs(self.config.screenshot_dir, exist_ok=True)
+            frame.save(path, compress_level=_FRAME_PNG_COMPRESSION)
+        except Exception as e:
+            self.log(f"WARNING: Failed to save {path}: {e}")
+    
+    def capture_image(self) -> Optional["Image.Image"]:
+        """Capture the screen as an in-memory RGB image, without any file.
+        
+        Reads pixels straight from the X server over a persistent connection: no
+        screenshot-tool fork, PNG encode/decode or disk round trip.
+        
+        Returns:
+            The screen image, or None if direct capture isn't available (use
+            take_screenshot instead)
+        """
+        if self._grabber_failed or not HAS_XLIB or not HAS_PIL:
+            return None
+        with self._grabber_lock:
+            if self._grabber is None:
+                if self._grabber_failed:
+                    return None
+                try:
+                    self._grabber = _ScreenGrabber(self.config.display)
+                except Exception as e:
+                    self.log(f"Direct screen capture unavailable ({e}), using screenshot tool")
+                    self._grabber_failed = True
+                    return None
+            try:
+                return self._grabber.grab()
+            except Exception as e:
+                self.log(f"Direct screen capture failed ({e}), using screenshot tool")
+                self._grabber.close()
+                self._grabber = None
+                self._grabber_failed = True
+                return None
+    
     def wait_for_state_match(
         self,
         reference_path: str,
@@ -312,7 +594,10 @@ class ScreenshotHandler:
         threshold: float = 0.01,
         max_diff_percentage: float = 10.0,
         success_message: Optional[str] = None,
-        waiting_message: Optional[str] = None
+        waiting_message: Optional[str] = None,
+        poll_interval: float = 1.0,
+        downsample: int = 1,
+        mode: str = "RGB"
     ) -> Tuple[bool, Optional[Dict[str, Any]]]:
         """Wait until screenshot matches reference image or timeout.
         
@@ -324,6 +609,11 @@ class ScreenshotHandler:
             max_diff_percentage: Max percentage of pixels that may differ
             success_message: Custom success message (default includes metrics)
             waiting_message: Custom waiting message (default includes metrics)
+            poll_interval: Longest delay between attempts; polling starts faster
+                and backs off toward this while the screen isn't converging
+            downsample: Box-average both images by this factor before the full
+                comparison (see compare_images_pil); the reference is reduced once
+            mode: Comparison mode for compare_images_pil ("RGB" or "L")
             
         Returns:
             Tuple of (success: bool, result: dict or None)
@@ -337,63 +627,261 @@ class ScreenshotHandler:
             )
             return True, None  # Don't fail if reference doesn't exist
         
-        elapsed = 0
-        while elapsed < timeout:
-            current_path = os.path.join(self.config.screenshot_dir, screenshot_filename)
-            current = self.take_screenshot(current_path)
-            if not current:
-                self.log("ERROR: Failed to capture screenshot for state check")
-                time.sleep(1)
-                elapsed += 1
-                continue
-            
-            try:
-                self.log(f"Current: {current}")
-                self.log(f"Reference: {reference_path}")
-                result = compare_images_pil(reference_path, current, threshold=threshold, max_diff_percentage=max_diff_percentage)
+        # Decoded once and cached on the handler; it doesn't change while we poll.
+        try:
+            reference = self._load_reference(reference_path)
+            # In "L" mode the metric is |L(a) - L(b)|, so the thumbnail bound has to
+            # be taken on grey images too; the RGB one would reject hue-only changes.
+            reference_thumb = (reference if mode == "RGB" else reference.convert(mode)).reduce(_THUMB_FACTOR)
+            reference_small = reference.reduce(downsample) if downsample > 1 else reference
+            if reference_small.mode != mode:
+                reference_small = reference_small.convert(mode)
+        except Exception as e:
+            self.log(f"WARNING: Failed to load reference screenshot: {e}")
+            reference = reference_thumb = reference_small = None
+        
+        watcher = self._open_change_watcher()
+        current_path = os.path.join(self.config.screenshot_dir, screenshot_filename)
+        last_frame = None
+        
+        # Adaptive poll delay: start short, back off toward poll_interval while the
+        # screen isn't getting closer to the reference, tighten again when it is.
+        min_delay = min(_MIN_POLL_DELAY, poll_interval)
+        delay = min_delay
+        prev_mean_diff = None
+        deadline = time.monotonic() + timeout
+        
+        def pause(mean_diff: Optional[float] = None) -> None:
+            """Sleep the adaptive delay, then (if possible) until the screen is redrawn."""
+            nonlocal delay, prev_mean_diff
+            if mean_diff is not None and prev_mean_diff is not None and mean_diff < prev_mean_diff * 0.9:
+                delay = max(delay / 2, min_delay)
+            else:
+                delay = min(delay * 2, poll_interval)
+            if mean_diff is not None:
+                prev_mean_diff = mean_diff
+            time.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+            remaining = deadline - time.monotonic()
+            if watcher is not None and remaining > 0:
+                # Cap the wait so a missed event only delays us, never stalls us.
+                watcher.wait(min(remaining, _MAX_IDLE_WAIT))
+        
+        try:
+            while time.monotonic() < deadline:
+                if watcher is not None:
+                    # Only redraws after this point should trigger another capture.
+                    watcher.reset()
+                current = None
+                current_img = last_frame = self.capture_image()
+                if current_img is None:
+                    current = self.take_screenshot(current_path)
+                    if not current:
+                        self.log("ERROR: Failed to capture screenshot for state check")
+                        time.sleep(max(0.0, min(poll_interval, deadline - time.monotonic())))
+                        continue
                 
-                if result["is_match"]:
-                    if success_message:
-                        self.log(success_message)
+                mean_diff = None
+                try:
+                    self.log(f"Current: {current or 'X display ' + self.config.display}")
+                    self.log(f"Reference: {reference_path}")
+                    if current_img is None:
+                        current_img = _open_image(current)
+                    if reference_thumb is not None and current_img.size == reference.size:
+                        # Box-averaging can only shrink the mean diff, so if even the
+                        # thumbnails are too far apart the full images can't match.
+                        if current_img.mode != "RGB":
+                            current_img = current_img.convert("RGB")
+                        current_thumb = current_img if mode == "RGB" else current_img.convert(mode)
+                        thumb_diff = _mean_luma_diff(reference_thumb, current_thumb.reduce(_THUMB_FACTOR))
+                        if thumb_diff - _THUMB_ROUNDING_SLACK >= 255.0 * threshold:
+                            self.log(waiting_message or f"Waiting... (mean_diff>={thumb_diff:.2f} from thumbnail)")
+                            pause(thumb_diff)
+                            continue
+                    if reference_small is not None and downsample > 1:
+                        if current_img.mode != "RGB":
+                            current_img = current_img.convert("RGB")
+                        current_img = current_img.reduce(downsample)
+                    result = compare_images_pil(
+                        reference_path,
+                        current,
+                        threshold=threshold,
+                        max_diff_percentage=max_diff_percentage,
+                        downsample=downsample if reference_small is None else 1,
+                        reference=reference_small,
+                        current=current_img,
+                        stop_early=True,
+                        mode=mode,
+                    )
+                    
+                    if result["is_match"]:
+                        if success_message:
+                            self.log(success_message)
+                        else:
+                            self.log(
+                                f"✓ State match reached "
+                                f"(mean_diff={result['mean_diff']:.2f}, diff_percentage={result['diff_percentage']:.2f}%)"
+                            )
+                        # Matched: the in-memory frame isn't needed on disk.
+                        last_frame = None
+                        return True, result
+                    
+                    # Log progress
+                    if waiting_message:
+                        self.log(waiting_message)
                     else:
                         self.log(
-                            f"✓ State match reached "
-                            f"(mean_diff={result['mean_diff']:.2f}, diff_percentage={result['diff_percentage']:.2f}%)"
+                            f"Waiting... (mean_diff={result['mean_diff']:.2f}, "
+                            f"diff_percentage={result['diff_percentage']:.2f}%)"
                         )
-                    return True, result
+                    mean_diff = result["mean_diff"]
+                except Exception as e:
+                    self.log(f"WARNING: Failed to compare screenshots: {e}")
                 
-                # Log progress
-                if waiting_message:
-                    self.log(waiting_message)
-                else:
-                    self.log(
-                        f"Waiting... (mean_diff={result['mean_diff']:.2f}, "
-                        f"diff_percentage={result['diff_percentage']:.2f}%)"
-                    )
-            except Exception as e:
-                self.log(f"WARNING: Failed to compare screenshots: {e}")
-            
-            time.sleep(1)
-            elapsed += 1
+                pause(mean_diff)
+        finally:
+            if watcher is not None:
+                watcher.close()
+            if last_frame is not None:
+                # Keep the last mismatching frame on disk for debugging.
+                # PNG encoding takes tens of ms, so don't make the caller wait for it.
+                threading.Thread(
+                    target=self._save_frame, args=(last_frame, current_path), name="save-state-frame"
+                ).start()
         
         self.log(f"WARNING: State match not reached after {timeout}s, continuing anyway...")
         return False, None
 
 
+class _ScreenGrabber:
+    """Reads the root window straight from the X server with GetImage."""
+
+    def __init__(self, display_name: str):
+        self._display = xdisplay.Display(display_name)
+        screen = self._display.screen()
+        self._root = screen.root
+        self._size = (screen.width_in_pixels, screen.height_in_pixels)
+        # 32-bit ZPixmap pixels are B,G,R,X in memory on LSB-first servers.
+        lsb_first = self._display.display.info.image_byte_order == X.LSBFirst
+        self._rawmode = "BGRX" if lsb_first else "XRGB"
+
+    def grab(self) -> "Image.Image":
+        """Return the current screen contents as an RGB image."""
+        width, height = self._size
+        reply = self._root.get_image(0, 0, width, height, X.ZPixmap, 0xFFFFFFFF)
+        if len(reply.data) != width * height * 4:
+            raise ValueError(f"unsupported pixel format (depth {reply.depth})")
+        return Image.frombuffer("RGB", self._size, reply.data, "raw", self._rawmode, 0, 1)
+
+    def close(self) -> None:
+        """Close the X connection."""
+        try:
+            self._display.close()
+        except Exception:
+            pass
+
+
+# zlib level for PNGs of captured frames: several times faster to encode than
+# Pillow's default of 6, for files only somewhat larger.
+_FRAME_PNG_COMPRESSION = 1
+
+# Expired sidecars are swept at most this often (seconds), not on every save.
+_SIDECAR_PRUNE_INTERVAL = 60.0
+
+# Shortest delay between state-check captures.
+_MIN_POLL_DELAY = 0.1
+
+# Longest time to wait for a redraw before capturing anyway.
+_MAX_IDLE_WAIT = 5.0
+
+
+class _ScreenChangeWatcher:
+    """Tracks redraws anywhere on the X screen using the DAMAGE extension.
+
+    Lets state polling skip screenshots while nothing on screen has changed,
+    instead of capturing on a fixed timer.
+    """
+
+    def __init__(self, display_name: str):
+        self._display = xdisplay.Display(display_name)
+        try:
+            if not self._display.has_extension(xdamage.extname):
+                raise RuntimeError("DAMAGE extension not available")
+            self._display.damage_query_version(1, 1)
+            self._damage = self._display.screen().root.damage_create(xdamage.DamageReportNonEmpty)
+            self._display.sync()
+        except Exception:
+            self._display.close()
+            raise
+        self._changed = True
+
+    def reset(self) -> None:
+        """Forget redraws seen so far; call right before capturing the screen."""
+        self._display.damage_subtract(self._damage)
+        self._display.sync()
+        self._drain()
+        self._changed = False
+
+    def wait(self, timeout: float) -> bool:
+        """Block until the screen is redrawn or timeout expires.
+
+        Returns:
+            True if something was redrawn since the last reset()
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self._drain()
+            if self._changed:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            select.select([self._display], [], [], remaining)
+
+    def close(self) -> None:
+        """Release the damage object and the X connection."""
+        try:
+            self._display.damage_destroy(self._damage)
+            self._display.close()
+        except Exception:
+            pass
+
+    def _drain(self) -> None:
+        while self._display.pending_events():
+            if isinstance(self._display.next_event(), xdamage.DamageNotify):
+                self._changed = True
+
+
 def compare_images_pil(
     img1_path: str,
-    img2_path: str,
+    img2_path: Optional[str],
     *,
     threshold: float = 0.01,
     max_diff_percentage: float = 1.0,
+    downsample: int = 1,
+    reference: Optional["Image.Image"] = None,
+    current: Optional["Image.Image"] = None,
+    stop_early: bool = False,
+    mode: str = "RGB",
 ) -> Dict[str, Any]:
     """Compare two images with Pillow and return similarity metrics.
 
     Args:
         img1_path: Reference image path
-        img2_path: Current image path
+        img2_path: Current image path (None if current is given and not on disk)
         threshold: Mean pixel diff threshold as a fraction of 255
         max_diff_percentage: Max percentage of pixels that may differ
+        downsample: If > 1, box-average both images by this factor before diffing.
+            Much cheaper and still catches layout changes, but metrics are approximate.
+        reference: Already-decoded image for img1_path (see load_reference_image),
+            so polling loops don't re-decode the same reference every iteration.
+        current: Already-opened image for img2_path, if the caller has one.
+        stop_early: With NumPy, diff in horizontal bands and stop once more than
+            max_diff_percentage of all pixels differ. has_changes is still exact,
+            but mean_diff and max_diff then only cover the bands scanned, and
+            diff_percentage is a lower bound (already above max_diff_percentage).
+        mode: "RGB" diffs colour and takes the luma of the difference. "L" turns
+            both images grey first (JPEGs are decoded straight to grey), which
+            moves a third of the data but misses changes that keep brightness.
 
     Returns:
         Dict containing mean_diff, max_diff, diff_percentage, is_similar, has_changes, is_match
@@ -401,28 +889,92 @@ def compare_images_pil(
     if not HAS_PIL:
         raise RuntimeError("Pillow is required for image comparison (install Pillow).")
 
-    img1 = Image.open(img1_path)
-    img2 = Image.open(img2_path)
+    if img2_path and _same_file_contents(img1_path, img2_path):
+        # Byte-identical files; no need to decode anything.
+        return {
+            "mean_diff": 0.0,
+            "max_diff": 0,
+            "diff_percentage": 0.0,
+            "is_similar": True,
+            "has_changes": False,
+            "is_match": True,
+        }
+
+    if mode not in ("RGB", "L"):
+        raise ValueError(f"Unsupported comparison mode: {mode}")
+
+    raw1 = raw2 = None
+    if HAS_NUMPY and mode == "RGB" and downsample == 1 and reference is None and current is None:
+        # With fresh raw sidecars on both sides, diff the memory-mapped pixels
+        # directly: no Pillow copy, and with stop_early only the bands actually
+        # compared get read from disk.
+        raw1 = _open_raw(img1_path)
+        raw2 = _open_raw(img2_path) if raw1 is not None else None
+
+    if raw2 is not None:
+        if raw1.shape != raw2.shape:
+            raise ValueError(
+                f"Images have different sizes: {raw1.shape[1::-1]} vs {raw2.shape[1::-1]}"
+            )
+        total_pixels = raw1.shape[0] * raw1.shape[1]
+    else:
+        img1 = reference if reference is not None else _open_image(img1_path)
+        img2 = current if current is not None else _open_image(img2_path)
+
+        if img1.size != img2.size:
+            raise ValueError(f"Images have different sizes: {img1.size} vs {img2.size}")
 
-    if img1.size != img2.size:
-        raise ValueError(f"Images have different sizes: {img1.size} vs {img2.size}")
+        factor1 = factor2 = downsample
+        if downsample > 1:
+            img1, factor1 = _draft_reduce(img1, downsample, mode)
+            img2, factor2 = _draft_reduce(img2, downsample, mode)
 
-    if img1.mode != "RGB":
-        img1 = img1.convert("RGB")
-    if img2.mode != "RGB":
-        img2 = img2.convert("RGB")
+        if img1.mode != mode:
+            img1 = img1.convert(mode)
+        if img2.mode != mode:
+            img2 = img2.convert(mode)
 
-    # Work in grayscale for easy pixel-diff counting.
-    diff = ImageChops.difference(img1, img2).convert("L")
-    stat = ImageStat.Stat(diff)
+        if factor1 > 1:
+            img1 = img1.reduce(factor1)
+        if factor2 > 1:
+            img2 = img2.reduce(factor2)
 
-    mean_diff = float(stat.mean[0])
-    hist = diff.histogram()  # 256 bins
-    max_diff = int(max(i for i, count in enumerate(hist) if count))
+        total_pixels = img1.size[0] * img1.size[1]
+
+    if HAS_NUMPY:
+        # Single pass over both buffers instead of diff + convert + stat + histogram.
+        channels = 3 if mode == "RGB" else 1
+        diff_stats = _diff_kernel() if channels == 3 else _gray_diff_stats
+        if raw2 is not None:
+            a = raw1.reshape(-1)
+            b = raw2.reshape(-1)
+        else:
+            a = np.asarray(img1).ravel()
+            b = np.asarray(img2).ravel()
+        band = _EARLY_EXIT_BAND_PIXELS * channels if stop_early else max(a.shape[0], 1)
+        changed_limit = max_diff_percentage * total_pixels / 100
+        diff_sum = max_diff = different_pixels = scanned = 0
+        for start in range(0, a.shape[0], band):
+            band_sum, band_max, band_count = diff_stats(a[start:start + band], b[start:start + band])
+            diff_sum += band_sum
+            max_diff = max(max_diff, band_max)
+            different_pixels += band_count
+            scanned += min(band, a.shape[0] - start) // channels
+            if stop_early and different_pixels > changed_limit:
+                # Already too many changed pixels to match; the rest can't undo that.
+                break
+        mean_diff = diff_sum / scanned if scanned else 0.0
+    else:
+        # Work in grayscale for easy pixel-diff counting. All three metrics come
+        # from one 256-bin histogram, so the diff image is only scanned once.
+        hist = _luma_diff_histogram(img1, img2)
+
+        mean_diff = sum(i * count for i, count in enumerate(hist)) / total_pixels if total_pixels else 0.0
+        max_diff = int(max(i for i, count in enumerate(hist) if count))
+
+        zero_pixels = int(hist[0])
+        different_pixels = total_pixels - zero_pixels
 
-    total_pixels = img1.size[0] * img1.size[1]
-    zero_pixels = int(hist[0])
-    different_pixels = total_pixels - zero_pixels
     diff_percentage = (different_pixels / total_pixels) * 100 if total_pixels else 0.0
 
     is_similar = mean_diff < (255.0 * threshold)
@@ -438,3 +990,251 @@ def compare_images_pil(
         "is_match": is_match,
     }
 
+
+def load_reference_image(path: str) -> "Image.Image":
+    """Decode a reference image once, as RGB, for repeated compare_images_pil calls."""
+    if not HAS_PIL:
+        raise RuntimeError("Pillow is required for image comparison (install Pillow).")
+    img = _open_image(path)
+    # convert() always returns a fully decoded copy, detached from the file.
+    return img.convert("RGB")
+
+
+def _draft_reduce(img: "Image.Image", factor: int, mode: str = "RGB") -> Tuple["Image.Image", int]:
+    """Let the JPEG decoder shrink a not-yet-loaded image by up to factor.
+
+    JPEG can decode at 1/2, 1/4 or 1/8 scale straight from the DCT coefficients,
+    which is far cheaper than a full decode followed by reduce(). Other formats
+    (and already-decoded images) are returned unchanged.
+
+    Returns:
+        Tuple of (image, factor still to apply with reduce())
+    """
+    if factor & (factor - 1) or getattr(img, "format", None) != "JPEG":
+        return img, factor
+    width, height = img.size
+    img.draft(mode, (width // factor, height // factor))
+    return img, factor // round(width / img.size[0])
+
+
+def _luma_diff_histogram(img1: "Image.Image", img2: "Image.Image") -> list:
+    """256-bin histogram of the grayscale per-pixel difference of two RGB images."""
+    diff = ImageChops.difference(img1, img2)
+    total = diff.size[0] * diff.size[1]
+    bbox = diff.getbbox()
+    if bbox is None:
+        # Identical images: nothing to convert or count.
+        return [total] + [0] * 255
+    # Everything outside the changed region is zero, so only convert that part.
+    hist = diff.crop(bbox).convert("L").histogram()
+    hist[0] += total - (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+    return hist
+
+
+def _mean_luma_diff(img1: "Image.Image", img2: "Image.Image") -> float:
+    """Mean grayscale per-pixel difference of two same-size RGB (or two L) images."""
+    hist = _luma_diff_histogram(img1, img2)
+    total = img1.size[0] * img1.size[1]
+    return sum(i * count for i, count in enumerate(hist)) / total if total else 0.0
+
+
+# State waits first compare 1/16-scale thumbnails (64x48 at 1024x768).
+_THUMB_FACTOR = 16
+# Thumbnail pixels are rounded to uint8 and luma is rounded again, so allow this
+# much before treating a thumbnail diff as a lower bound on the full-size diff.
+_THUMB_ROUNDING_SLACK = 2.0
+
+
+def _file_sha256(path: str) -> str:
+    """Return the hex SHA-256 of a file, streamed in 64 KiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_digest_sidecar(path: str) -> Optional[str]:
+    """Return the digest stored in ``<path>.sha256`` if it is not older than the image."""
+    digest_path = path + ".sha256"
+    try:
+        if os.path.getmtime(digest_path) < os.path.getmtime(path):
+            return None
+        with open(digest_path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _command_in_path(command: str) -> bool:
+    """Check if a command exists in PATH, resolved once per process."""
+    return shutil.which(command) is not None
+
+
+def _same_file_contents(path1: str, path2: str) -> bool:
+    """Check whether two files are byte-identical: sidecars, then sizes, then SHA-256."""
+    digest1 = _read_digest_sidecar(path1)
+    if digest1 is not None and digest1 == _read_digest_sidecar(path2):
+        return True
+    try:
+        st1 = os.stat(path1)
+        st2 = os.stat(path2)
+    except OSError:
+        return False
+    if st1.st_size != st2.st_size:
+        return False
+    return _file_digest(path1, st1) == _file_digest(path2, st2)
+
+
+def _file_digest(path: str, st: os.stat_result) -> str:
+    """SHA-256 of a file, from its sidecar when fresh, else hashed (and memoized)."""
+    return _read_digest_sidecar(path) or _cached_file_sha256(path, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_file_sha256(path: str, mtime_ns: int, size: int) -> str:
+    """_file_sha256 keyed on mtime and size, so an unchanged reference is hashed once."""
+    return _file_sha256(path)
+
+
+def _open_raw(path: str):
+    """Memory-map a fresh raw ``.npy`` RGB sidecar for path, or return None."""
+    if not HAS_NUMPY:
+        return None
+    raw_path = path + ".npy"
+    try:
+        if os.path.getmtime(raw_path) < os.path.getmtime(path):
+            return None
+        pixels = np.load(raw_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if pixels.dtype != np.uint8 or pixels.ndim != 3 or pixels.shape[2] != 3:
+        return None
+    return pixels
+
+
+def _open_image(path: str) -> "Image.Image":
+    """Open an image, preferring a fresh raw ``.npy`` sidecar over PNG decode."""
+    pixels = _open_raw(path)
+    if pixels is not None:
+        return Image.fromarray(pixels)
+    return Image.open(path)
+
+
+_DIFF_BLOCK_PIXELS = 65536
+# Pixels per band when compare_images_pil may stop early (1/3 of 1024x768).
+_EARLY_EXIT_BAND_PIXELS = 4 * _DIFF_BLOCK_PIXELS
+
+
+def _make_diff_stats(prange):
+    """Build the diff-stats kernel around a loop range: ``range`` or ``numba.prange``."""
+    def _diff_stats(a, b):
+        """Grayscale diff statistics for two flattened RGB uint8 buffers.
+
+        Matches ``ImageChops.difference(a, b).convert("L")`` (Pillow's ITU-R 601-2
+        luma with rounding) and reduces it in one pass.
+
+        Returns:
+            Tuple of (sum of luma diffs, max luma diff, count of non-zero pixels)
+        """
+        n_pixels = a.shape[0] // 3
+        n_blocks = (n_pixels + _DIFF_BLOCK_PIXELS - 1) // _DIFF_BLOCK_PIXELS
+        sums = np.zeros(n_blocks, np.int64)
+        maxes = np.zeros(n_blocks, np.int64)
+        counts = np.zeros(n_blocks, np.int64)
+
+        for blk in prange(n_blocks):
+            start = blk * _DIFF_BLOCK_PIXELS
+            stop = min(start + _DIFF_BLOCK_PIXELS, n_pixels)
+            block_sum = 0
+            block_max = 0
+            block_count = 0
+            for i in range(start, stop):
+                j = i * 3
+                dr = abs(np.int64(a[j]) - np.int64(b[j]))
+                dg = abs(np.int64(a[j + 1]) - np.int64(b[j + 1]))
+                db = abs(np.int64(a[j + 2]) - np.int64(b[j + 2]))
+                luma = (dr * 19595 + dg * 38470 + db * 7471 + 0x8000) >> 16
+                block_sum += luma
+                if luma > block_max:
+                    block_max = luma
+                if luma:
+                    block_count += 1
+            sums[blk] = block_sum
+            maxes[blk] = block_max
+            counts[blk] = block_count
+
+        if n_blocks == 0:
+            return 0, 0, 0
+        return int(sums.sum()), int(maxes.max()), int(counts.sum())
+
+    return _diff_stats
+
+
+# Pure-Python build of the kernel; the reference the faster paths are checked against.
+_diff_stats = _make_diff_stats(range)
+
+
+def _diff_stats_numpy(a, b):
+    """Vectorized _diff_stats for when Numba isn't installed; same inputs and result.
+
+    Works a block of pixels at a time in per-thread scratch buffers that are
+    reused across calls, so the int32 temporaries stay cache-sized and polling
+    doesn't allocate (and page-fault in) fresh arrays for every frame.
+    """
+    block, luma, term = _diff_scratch()
+    diff_sum = max_diff = different_pixels = 0
+    step = block.shape[0]
+    for start in range(0, a.shape[0], step):
+        n = min(step, a.shape[0] - start)
+        d = block[:n]
+        np.subtract(a[start:start + n], b[start:start + n], out=d, dtype=np.int32)
+        np.abs(d, out=d)
+        d3 = d.reshape(-1, 3)
+        px = luma[:n // 3]
+        t = term[:n // 3]
+        np.multiply(d3[:, 0], 19595, out=px)
+        np.multiply(d3[:, 1], 38470, out=t)
+        px += t
+        np.multiply(d3[:, 2], 7471, out=t)
+        px += t
+        px += 0x8000
+        px >>= 16
+        diff_sum += int(px.sum(dtype=np.int64))
+        max_diff = max(max_diff, int(px.max()))
+        different_pixels += int(np.count_nonzero(px))
+    return diff_sum, max_diff, different_pixels
+
+
+_scratch = threading.local()
+
+
+def _diff_scratch():
+    """This thread's (channel diff, luma, luma term) buffers for _diff_stats_numpy."""
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None:
+        buffers = _scratch.buffers = (
+            np.empty(_DIFF_BLOCK_PIXELS * 3, np.int32),
+            np.empty(_DIFF_BLOCK_PIXELS, np.int32),
+            np.empty(_DIFF_BLOCK_PIXELS, np.int32),
+        )
+    return buffers
+
+
+def _gray_diff_stats(a, b):
+    """_diff_stats for flattened single-channel uint8 buffers."""
+    d = np.abs(a.astype(np.int16) - b)
+    return int(d.sum(dtype=np.int64)), int(d.max()), int(np.count_nonzero(d))
+
+
+@functools.lru_cache(maxsize=1)
+def _diff_kernel():
+    """Return the diff-stats kernel compiled with Numba if installed, else _diff_stats_numpy."""
+    if not HAS_NUMBA:
+        return _diff_stats_numpy
+    try:
+        import numba
+    except ImportError:  # pragma: no cover
+        return _diff_stats_numpy
+    return numba.njit(parallel=True, cache=True)(_make_diff_stats(numba.prange))
@@ -5,19 +5,85 @@ HTTP server for screenshot API.
 import os
 import json
 import glob
+import shutil
+import threading
 import time
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse
 
 from .screenshot import ScreenshotHandler
 from .config import Config
 
 
+_TIMESTAMP_FMT = "%Y-%m-%d %H:%M:%S"
+
+# Static index page, encoded once at import time.
+_INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+    <title>Screenshot Service</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; }
+        .endpoint { background: #f5f5f5; padding: 15px; margin: 10px 0; border-radius: 5px; }
+        code { background: #e0e0e0; padding: 2px 6px; border-radius: 3px; }
+        a { color: #0066cc; }
+    </style>
+</head>
+<body>
+    <h1>Screenshot Service</h1>
+    <p>HTTP server for taking and viewing screenshots of the IB Gateway display.</p>
+    
+    <h2>API Endpoints</h2>
+    
+    <div class="endpoint">
+        <h3>GET <code>/screenshot</code></h3>
+        <p>Take a new screenshot and return its URL.</p>
+        <p><a href="/screenshot">Try it</a></p>
+    </div>
+    
+    <div class="endpoint">
+        <h3>GET <code>/screenshot/latest</code></h3>
+        <p>Get information about the latest screenshot.</p>
+        <p><a href="/screenshot/latest">Try it</a></p>
+    </div>
+    
+    <div class="endpoint">
+        <h3>GET <code>/screenshots</code></h3>
+        <p>List all available screenshots.</p>
+        <p><a href="/screenshots">Try it</a></p>
+    </div>
+    
+    <div class="endpoint">
+        <h3>GET <code>/screenshots/&lt;filename&gt;</code></h3>
+        <p>View a specific screenshot image.</p>
+    </div>
+
+    <div class="endpoint">
+        <h3>GET <code>/health</code></h3>
+        <p>Visual connection status check. Captures a screenshot and analyses the IB Gateway Connection Status table.</p>
+        <p>Returns JSON with <code>overall</code> status (<code>healthy</code> / <code>degraded</code> / <code>unhealthy</code>) and per-row color analysis.</p>
+        <p>HTTP 200 = healthy or degraded &nbsp;|&nbsp; HTTP 503 = unhealthy.</p>
+        <p><a href="/health">Try it</a></p>
+    </div>
+
+    <h2>Quick Actions</h2>
+    <p><a href="/screenshot">Take Screenshot Now</a></p>
+    <p><a href="/screenshots">View All Screenshots</a></p>
+    <p><a href="/health">Check Connection Status</a></p>
+</body>
+</html>""".encode("utf-8")
+
+
 class ScreenshotServer(BaseHTTPRequestHandler):
     """HTTP server for screenshot API."""
     
     screenshot_handler = None
     screenshot_dir = "/tmp/screenshots"
+    _real_dir = "/tmp/screenshots"
+    verbose = False
+    # Requests are served on separate threads; cap concurrent captures so a
+    # burst of /screenshot calls does not thrash the X server.
+    capture_semaphore = threading.Semaphore(4)
     
     @classmethod
     def run_server(cls, config: Config, port: int, verbose: bool = False) -> int:
@@ -32,9 +98,11 @@ class ScreenshotServer(BaseHTTPRequestHandler):
             Exit code (0 on success)
         """
         cls.screenshot_handler = ScreenshotHandler(config, verbose)
+        cls.verbose = verbose
         cls.screenshot_dir = config.screenshot_dir
+        cls._real_dir = os.path.realpath(config.screenshot_dir)
         
-        server = HTTPServer(("0.0.0.0", port), cls)
+        server = ThreadingHTTPServer(("0.0.0.0", port), cls)
         print(f"Screenshot server starting on port {port}")
         print(f"Screenshots directory: {config.screenshot_dir}")
         print(f"Access the service at: http://localhost:{port}/")
@@ -72,6 +140,14 @@ class ScreenshotServer(BaseHTTPRequestHandler):
         else:
             self.send_error(404, "Not found")
     
+    def do_HEAD(self):
+        """Handle HEAD requests (index only; used as a cheap liveness probe)."""
+        path = urlparse(self.path).path
+        if path == "/" or path == "/index.html":
+            self._handle_index(head_only=True)
+        else:
+            self.send_error(404, "Not found")
+    
     def _serve_screenshot_file(self, path: str):
         """Serve a screenshot file."""
         filename = path.replace("/screenshots/", "", 1)
@@ -85,21 +161,21 @@ class ScreenshotServer(BaseHTTPRequestHandler):
             self.send_error(400, "Only PNG files are allowed")
             return
         
-        filepath = os.path.join(self.screenshot_dir, filename)
-        real_path = os.path.realpath(filepath)
-        real_dir = os.path.realpath(self.screenshot_dir)
-        
-        if not real_path.startswith(real_dir):
+        # The filename has no separators, so the only way out of the directory
+        # is a symlink; one lstat is enough to rule that out.
+        filepath = os.path.join(self._real_dir, filename)
+        if os.path.islink(filepath):
             self.send_error(403, "Access denied")
             return
         
         if os.path.exists(filepath) and os.path.isfile(filepath):
             self.send_response(200)
             self.send_header("Content-type", "image/png")
+            self.send_header("Content-Length", str(os.path.getsize(filepath)))
             self.send_header("Access-Control-Allow-Origin", "http://localhost")
             self.end_headers()
             with open(filepath, "rb") as f:
-                self.wfile.write(f.read())
+                shutil.copyfileobj(f, self.wfile, 65536)
         else:
             self.send_error(404, "Screenshot not found")
     
@@ -110,7 +186,8 @@ class ScreenshotServer(BaseHTTPRequestHandler):
             return
         
         try:
-            screenshot_path = self.screenshot_handler.take_screenshot()
+            with self.capture_semaphore:
+                screenshot_path = self.screenshot_handler.take_screenshot()
             if screenshot_path:
                 filename = os.path.basename(screenshot_path)
                 screenshot_url = f"/screenshots/{filename}"
@@ -160,18 +237,29 @@ class ScreenshotServer(BaseHTTPRequestHandler):
     
     def _handle_list_screenshots(self):
         """Handle /screenshots endpoint - list all screenshots."""
-        screenshots = glob.glob(os.path.join(self.screenshot_dir, "screenshot_*.png"))
-        screenshots.sort(key=os.path.getctime, reverse=True)
+        # One stat per entry: (ctime, size, filename)
+        screenshots = []
+        try:
+            with os.scandir(self.screenshot_dir) as it:
+                for entry in it:
+                    name = entry.name
+                    if name.startswith("screenshot_") and name.endswith(".png"):
+                        st = entry.stat()
+                        screenshots.append((st.st_ctime, st.st_size, name))
+        except OSError:
+            pass
+        screenshots.sort(key=lambda item: item[0], reverse=True)
         
+        base_url = f"http://localhost:{self.server.server_port}"
         screenshot_list = []
-        for screenshot in screenshots:
-            filename = os.path.basename(screenshot)
+        for created, size, filename in screenshots:
+            url = "/screenshots/" + filename
             screenshot_list.append({
                 "filename": filename,
-                "url": f"/screenshots/{filename}",
-                "full_url": f"http://localhost:{self.server.server_port}/screenshots/{filename}",
-                "created": os.path.getctime(screenshot),
-                "size": os.path.getsize(screenshot)
+                "url": url,
+                "full_url": base_url + url,
+                "created": created,
+                "size": size
             })
         
         self.send_response(200)
@@ -186,67 +274,14 @@ class ScreenshotServer(BaseHTTPRequestHandler):
         }
         self.wfile.write(json.dumps(response, indent=2).encode())
     
-    def _handle_index(self):
+    def _handle_index(self, head_only: bool = False):
         """Handle root endpoint - serve HTML documentation."""
-        html = """<!DOCTYPE html>
-<html>
-<head>
-    <title>Screenshot Service</title>
-    <style>
-        body { font-family: Arial, sans-serif; margin: 40px; }
-        .endpoint { background: #f5f5f5; padding: 15px; margin: 10px 0; border-radius: 5px; }
-        code { background: #e0e0e0; padding: 2px 6px; border-radius: 3px; }
-        a { color: #0066cc; }
-    </style>
-</head>
-<body>
-    <h1>Screenshot Service</h1>
-    <p>HTTP server for taking and viewing screenshots of the IB Gateway display.</p>
-    
-    <h2>API Endpoints</h2>
-    
-    <div class="endpoint">
-        <h3>GET <code>/screenshot</code></h3>
-        <p>Take a new screenshot and return its URL.</p>
-        <p><a href="/screenshot">Try it</a></p>
-    </div>
-    
-    <div class="endpoint">
-        <h3>GET <code>/screenshot/latest</code></h3>
-        <p>Get information about the latest screenshot.</p>
-        <p><a href="/screenshot/latest">Try it</a></p>
-    </div>
-    
-    <div class="endpoint">
-        <h3>GET <code>/screenshots</code></h3>
-        <p>List all available screenshots.</p>
-        <p><a href="/screenshots">Try it</a></p>
-    </div>
-    
-    <div class="endpoint">
-        <h3>GET <code>/screenshots/&lt;filename&gt;</code></h3>
-        <p>View a specific screenshot image.</p>
-    </div>
-
-    <div class="endpoint">
-        <h3>GET <code>/health</code></h3>
-        <p>Visual connection status check. Captures a screenshot and analyses the IB Gateway Connection Status table.</p>
-        <p>Returns JSON with <code>overall</code> status (<code>healthy</code> / <code>degraded</code> / <code>unhealthy</code>) and per-row color analysis.</p>
-        <p>HTTP 200 = healthy or degraded &nbsp;|&nbsp; HTTP 503 = unhealthy.</p>
-        <p><a href="/health">Try it</a></p>
-    </div>
-
-    <h2>Quick Actions</h2>
-    <p><a href="/screenshot">Take Screenshot Now</a></p>
-    <p><a href="/screenshots">View All Screenshots</a></p>
-    <p><a href="/health">Check Connection Status</a></p>
-</body>
-</html>"""
-        
         self.send_response(200)
         self.send_header("Content-type", "text/html")
+        self.send_header("Content-Length", str(len(_INDEX_HTML)))
         self.end_headers()
-        self.wfile.write(html.encode())
+        if not head_only:
+            self.wfile.write(_INDEX_HTML)
     
     def _handle_health_check(self):
         """Handle /health endpoint - visual connection status check."""
@@ -257,7 +292,8 @@ class ScreenshotServer(BaseHTTPRequestHandler):
             return
 
         try:
-            status = check_connection_status(self.screenshot_handler.config)
+            with self.capture_semaphore:
+                status = check_connection_status(self.screenshot_handler.config)
             http_code = 200 if status.overall != OverallStatus.UNHEALTHY else 503
 
             self.send_response(http_code)
@@ -280,6 +316,12 @@ class ScreenshotServer(BaseHTTPRequestHandler):
             self.wfile.write(json.dumps(error_response).encode())
 
     def log_message(self, format, *args):
-        """Custom logging with timestamp."""
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {format % args}")
+        """Custom logging with timestamp (access log only in verbose mode)."""
+        if not self.verbose:
+            return
+        print(f"[{time.strftime(_TIMESTAMP_FMT)}] {format % args}")
+
+    def log_error(self, format, *args):
+        """Always log errors, even when the access log is disabled."""
+        print(f"[{time.strftime(_TIMESTAMP_FMT)}] {format % args}")
 
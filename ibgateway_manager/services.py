@@ -2,14 +2,381 @@
 Service managers for Xvfb, VNC, and noVNC.
 """
 
+import asyncio
+import mmap
 import os
+import select
+import shutil
+import socket
+import stat
 import subprocess
+import sys
+import threading
 import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, List, Optional, Set
 
 from .config import Config
 
+# Static argv pieces for the long-lived services; only the display, resolution
+# and port vary per start.
+_XVFB_ARGS_TAIL = ("-ac", "+extension", "GLX", "+render", "-noreset")
+_X11VNC_ARGS = ("-noxdamage", "-forever", "-shared")
+
+
+def _xvfb_argv(display: str, resolution: str) -> tuple:
+    """Build the Xvfb command line for display at resolution (WxH)."""
+    return ("Xvfb", display, "-screen", "0", f"{resolution}x24") + _XVFB_ARGS_TAIL
+
+
+def _spawn(argv, **kwargs) -> subprocess.Popen:
+    """Start a long-lived child through Popen's posix_spawn fast path.
+
+    CPython only uses posix_spawn (vfork+exec, no page-table copy) when the
+    executable has a directory component and close_fds is False, so argv[0] is
+    resolved on PATH here. Keeping fds open is safe: everything Python opens is
+    non-inheritable (PEP 446), so the child still only gets stdin/out/err.
+    """
+    executable = argv[0]
+    if os.sep not in executable:
+        executable = shutil.which(executable) or executable
+    return subprocess.Popen(argv, executable=executable, close_fds=False, **kwargs)
+
+
+def _port_open(port: int, host: str = "127.0.0.1", timeout: float = 0.2) -> bool:
+    """Return True if something accepts TCP connections on host:port."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        return sock.connect_ex((host, port)) == 0
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def _listening_ports() -> Set[int]:
+    """Return every TCP port with a socket in LISTEN state (IPv4 or IPv6).
+
+    Reads /proc/net/tcp{,6} directly; unlike a connect probe this does not open a
+    connection, which matters for forwarders that act on every accept. Callers
+    checking several ports should test membership in one result rather than
+    rescanning per port.
+    """
+    ports = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                next(f, None)  # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 3 and fields[3] == "0A":  # TCP_LISTEN
+                        ports.add(int(fields[1].rpartition(":")[2], 16))
+        except OSError:
+            continue
+    return ports
+
+
+def _is_listening(port: int) -> bool:
+    """Return True if a TCP socket is in LISTEN state on port (IPv4 or IPv6)."""
+    return port in _listening_ports()
+
+
+def _read_log_tail(path: str, max_bytes: int = 500) -> str:
+    """Return the last max_bytes of a log file without reading the whole file."""
+    try:
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - max_bytes))
+            return f.read().decode("utf-8", "replace")
+    except OSError:
+        return ""
+
+
+# inotify(7) event bits; there is no stdlib wrapper, so the watch goes through libc.
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+
+
+def _inotify_watch(*paths: str) -> Optional[int]:
+    """Return a non-blocking inotify fd watching paths for writes, or None if unavailable."""
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for path in paths:
+        if libc.inotify_add_watch(fd, os.fsencode(path), _IN_MODIFY | _IN_CLOSE_WRITE) < 0:
+            os.close(fd)
+            return None
+    return fd
+
+
+def _pidfd_open(pid: int) -> Optional[int]:
+    """Return a pidfd that becomes readable when pid exits, or None (needs Python 3.9+, Linux 5.3+)."""
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        return None
+
+
+def _wait_inotify(fd: Optional[int], timeout: float, also: Iterable[int] = ()) -> None:
+    """Block until fd reports an event, any fd in also is readable, or timeout elapses.
+
+    Queued inotify events are drained before returning.
+    """
+    if timeout <= 0:
+        return
+    fds = [f for f in (fd, *also) if f is not None]
+    if not fds:
+        time.sleep(timeout)
+        return
+    ready = select.select(fds, [], [], timeout)[0]
+    if fd is not None and fd in ready:
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class _LogReader:
+    """Incremental reader for a log file that returns only bytes appended since the last read.
+    
+    The file stays open between reads; if it is truncated or replaced, reading
+    restarts from the beginning of the new contents.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._offset = 0
+    
+    def _reopen_if_rotated(self) -> None:
+        """Reopen the log if it was replaced, and rewind if it was truncated."""
+        try:
+            current = os.stat(self.path)
+        except OSError:
+            return
+        if self._file is not None and os.fstat(self._file.fileno()).st_ino != current.st_ino:
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            try:
+                self._file = open(self.path, "rb")
+            except OSError:
+                return
+            self._offset = 0
+        elif current.st_size < self._offset:
+            self._offset = 0
+    
+    def read_new(self) -> bytes:
+        """Return the bytes appended since the previous call (b"" if none)."""
+        self._reopen_if_rotated()
+        if self._file is None:
+            return b""
+        self._file.seek(self._offset)
+        chunk = self._file.read()
+        self._offset += len(chunk)
+        return chunk
+    
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _LogWatcher(_LogReader):
+    """Watch a growing log file for a marker, scanning only bytes appended since the last scan.
+    
+    The file is searched through a read-only mmap with bytes.find, starting just
+    before the previous end so a marker split across two writes still matches;
+    nothing is copied or decoded. wait() blocks on an inotify watch so a write
+    wakes the caller straight away; without inotify it just sleeps.
+    """
+    
+    def __init__(self, path: str, marker: str):
+        super().__init__(path)
+        self.marker = marker.encode()
+        self._found = False
+        self._inotify_fd = _inotify_watch(path)
+    
+    def found(self) -> bool:
+        """Scan newly appended bytes and return True once the marker has been written."""
+        if self._found:
+            return True
+        self._reopen_if_rotated()
+        if self._file is None:
+            return False
+        size = os.fstat(self._file.fileno()).st_size
+        if size <= self._offset:
+            return False
+        start = max(0, self._offset - len(self.marker) + 1)
+        with mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            self._found = mm.find(self.marker, start) != -1
+        self._offset = size
+        return self._found
+    
+    def wait(self, timeout: float, also: Iterable[int] = ()) -> None:
+        """Return after the file is written to, an fd in also is readable, or timeout seconds."""
+        _wait_inotify(self._inotify_fd, timeout, also)
+    
+    def close(self) -> None:
+        super().close()
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+
+class _LogTailer:
+    """Copy whatever is appended to a set of log files to stdout, like ``tail -f``.
+    
+    Runs on a daemon thread that wakes on inotify write events (or every 0.5s
+    without inotify) and flushes after each write. With several files, output
+    switches are marked with tail's ``==> path <==`` headers.
+    """
+    
+    def __init__(self, paths: List[str], out=None):
+        self.readers = [_LogReader(path) for path in paths]
+        self.out = out
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify_fd: Optional[int] = None
+        self._last_path: Optional[str] = None
+    
+    def start(self) -> None:
+        """Start the tailing thread."""
+        self._inotify_fd = _inotify_watch(*(reader.path for reader in self.readers))
+        self._thread = threading.Thread(target=self._run, name="log-tail", daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        out = self.out or sys.stdout.buffer
+        poll_interval = 1.0 if self._inotify_fd is not None else 0.5
+        while not self._stop.is_set():
+            for reader in self.readers:
+                chunk = reader.read_new()
+                if not chunk:
+                    continue
+                if len(self.readers) > 1 and reader.path != self._last_path:
+                    header = f"\n==> {reader.path} <==\n" if self._last_path else f"==> {reader.path} <==\n"
+                    out.write(header.encode())
+                    self._last_path = reader.path
+                out.write(chunk)
+                out.flush()
+            _wait_inotify(self._inotify_fd, poll_interval)
+    
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def stop(self) -> None:
+        """Stop the tailing thread and close the files."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        for reader in self.readers:
+            reader.close()
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+
+def _wait(check_fn: Callable[[], Optional[bool]], timeout: float) -> Optional[bool]:
+    """Poll check_fn with exponential backoff (20 ms up to 500 ms) until timeout.
+
+    check_fn returns True when ready, False on a fatal error, or None to keep waiting.
+
+    Returns:
+        The first non-None result of check_fn, or None if the timeout elapsed
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while True:
+        result = check_fn()
+        if result is not None:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(0.5, delay * 1.5)
+
+
+async def _wait_async(check_fn: Callable[[], Optional[bool]], timeout: float) -> Optional[bool]:
+    """Like _wait, but yields to the event loop between polls."""
+    deadline = time.monotonic() + timeout
+    delay = 0.02
+    while True:
+        result = check_fn()
+        if result is not None:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(0.5, delay * 1.5)
+
+
+def shutdown_all(
+    processes: Iterable[Optional[subprocess.Popen]],
+    timeout: float = 5.0,
+    kill_after: float = 4.0,
+) -> None:
+    """Terminate several processes at once and wait for them against one deadline.
+
+    Every running process gets SIGTERM up front, then all are waited on together;
+    any still alive after kill_after seconds get SIGKILL. Worst case is one
+    timeout for the whole batch rather than one per process. Where pidfds are
+    available the wait blocks in select() and wakes as each process exits;
+    otherwise it polls with a short backoff.
+    """
+    running = [p for p in processes if p is not None and p.poll() is None]
+    for process in running:
+        try:
+            process.terminate()
+        except Exception:
+            pass
+    
+    pidfds = {}
+    for process in running:
+        fd = _pidfd_open(process.pid)
+        if fd is not None:
+            pidfds[fd] = process
+    
+    try:
+        started = time.monotonic()
+        killed = False
+        delay = 0.01
+        while running:
+            running = [p for p in running if p.poll() is None]
+            elapsed = time.monotonic() - started
+            if not running or elapsed >= timeout:
+                break
+            if not killed and elapsed >= kill_after:
+                for process in running:
+                    try:
+                        process.kill()
+                    except Exception:
+                        pass
+                killed = True
+            next_step = (timeout if killed else kill_after) - elapsed
+            waiting = [fd for fd, p in pidfds.items() if p in running]
+            if len(waiting) == len(running):
+                select.select(waiting, [], [], next_step)
+            else:
+                time.sleep(min(delay, next_step))
+                delay = min(0.1, delay * 2)
+    finally:
+        for fd in pidfds:
+            os.close(fd)
+
 
 class XvfbManager:
     """Manages Xvfb virtual display."""
@@ -66,21 +433,11 @@ class XvfbManager:
         
         self.log(f"=== Starting Xvfb on display {self.config.display} ===")
         
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        env = self.config.display_env
         
         try:
-            self.process = subprocess.Popen(
-                [
-                    "Xvfb",
-                    self.config.display,
-                    "-screen", "0",
-                    f"{self.config.resolution}x24",
-                    "-ac",
-                    "+extension", "GLX",
-                    "+render",
-                    "-noreset"
-                ],
+            self.process = _spawn(
+                _xvfb_argv(self.config.display, self.config.resolution),
                 env=env
             )
             self.log(f"Xvfb started (PID: {self.process.pid})")
@@ -93,31 +450,37 @@ class XvfbManager:
         """Wait for Xvfb to be ready."""
         self.log("Waiting for Xvfb to be ready...")
         
-        for i in range(timeout):
+        socket_paths = [
+            f"/tmp/.X11-unix/{self.config.display.replace(':', 'X')}",
+            "/tmp/.X11-unix/X0"
+        ]
+        started = time.monotonic()
+        
+        def check() -> Optional[bool]:
             if self.process and self.process.poll() is not None:
                 self.log("ERROR: Xvfb process exited")
                 return False
             
             # Check if display socket exists
-            socket_paths = [
-                Path(f"/tmp/.X11-unix/{self.config.display.replace(':', 'X')}"),
-                Path("/tmp/.X11-unix/X0")
-            ]
-            
             for socket_path in socket_paths:
-                if socket_path.exists() and socket_path.is_socket():
-                    self.log("✓ Xvfb is ready")
-                    return True
+                try:
+                    if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                        self.log("✓ Xvfb is ready")
+                        return True
+                except OSError:
+                    pass
             
             # If process is running, consider it ready after a few seconds
-            if self.process and i >= 3:
+            if self.process and time.monotonic() - started >= 3:
                 self.log("✓ Xvfb is ready (process running)")
                 return True
             
-            time.sleep(1)
+            return None
         
-        self.log("ERROR: Xvfb failed to start")
-        return False
+        result = _wait(check, timeout)
+        if result is None:
+            self.log("ERROR: Xvfb failed to start")
+        return bool(result)
     
     def stop(self):
         """Stop Xvfb process."""
@@ -155,23 +518,20 @@ class VNCManager:
         # Ensure log file exists
         Path(self.log_file).touch()
         
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        env = self.config.display_env
         
         try:
             with open(self.log_file, "a") as log_f:
-                self.process = subprocess.Popen(
-                    [
+                self.process = _spawn(
+                    (
                         "x11vnc",
                         "-display", self.config.display,
-                        "-noxdamage",
-                        "-forever",
-                        "-shared",
+                        *_X11VNC_ARGS,
                         "-rfbport", str(self.port),
                         "-nopw",  # Explicitly disable password (suppresses warning)
                         "-bg",
                         "-o", self.log_file
-                    ],
+                    ),
                     env=env,
                     stdout=log_f,
                     stderr=subprocess.STDOUT
@@ -186,57 +546,37 @@ class VNCManager:
         """Wait for VNC server to be ready."""
         self.log("Waiting for VNC server to be ready...")
         
-        # When using -bg, x11vnc forks and the parent process exits immediately
-        # So we need to wait a moment before checking, then verify the actual x11vnc process
-        time.sleep(2)  # Give x11vnc time to fork and start
-        
-        for i in range(timeout):
-            # Check if the actual x11vnc process is running (not the parent Popen process)
-            try:
-                # Check for x11vnc process listening on our port
-                result = subprocess.run(
-                    ["pgrep", "-f", f"x11vnc.*{self.port}"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    # Process exists, now check if port is listening
-                    pass
-            except Exception:
-                pass
-            
-            # Check if port is listening
-            try:
-                result = subprocess.run(
-                    ["netstat", "-tlnp"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0 and f":{self.port} " in result.stdout:
-                    self.log("✓ VNC server is ready")
-                    return True
-                
-                # Try ss as fallback
-                result = subprocess.run(
-                    ["ss", "-tlnp"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0 and f":{self.port} " in result.stdout:
-                    self.log("✓ VNC server is ready")
-                    return True
-            except Exception:
-                pass
-            
-            time.sleep(1)
+        # With -bg the launcher exits as soon as x11vnc forks, so poll the port
+        # (from t=0, with backoff) rather than the Popen process.
+        if _wait(self._check_ready, timeout):
+            return True
+        self._log_failure()
+        return False
+    
+    async def wait_for_ready_async(self, timeout: int = 30) -> bool:
+        """Wait for VNC server to be ready without blocking the event loop."""
+        self.log("Waiting for VNC server to be ready...")
         
+        if await _wait_async(self._check_ready, timeout):
+            return True
+        self._log_failure()
+        return False
+    
+    def _check_ready(self) -> Optional[bool]:
+        """Readiness check for _wait: True when ready, None to keep waiting."""
+        # The daemonized x11vnc child is ready once its port accepts connections
+        if _port_open(self.port):
+            self.log("✓ VNC server is ready")
+            return True
+        return None
+    
+    def _log_failure(self):
+        """Log a startup failure with the tail of the x11vnc log."""
         self.log("ERROR: VNC server failed to start")
         # Check log file for errors
-        if Path(self.log_file).exists():
-            log_content = Path(self.log_file).read_text()
-            if log_content:
-                self.log(f"Last log entries: {log_content[-500:]}")  # Last 500 chars
-        return False
+        log_tail = _read_log_tail(self.log_file, 500)
+        if log_tail:
+            self.log(f"Last log entries: {log_tail}")
     
     def stop(self):
         """Stop x11vnc process."""
@@ -272,17 +612,10 @@ class NoVNCManager:
     def _find_websockify(self) -> Optional[list]:
         """Find websockify command or module."""
         # Try command first
-        try:
-            result = subprocess.run(
-                ["which", "websockify"],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                self.log(f"websockify found: {result.stdout.strip()}")
-                return ["websockify"]
-        except Exception:
-            pass
+        path = shutil.which("websockify")
+        if path:
+            self.log(f"websockify found: {path}")
+            return [path]
         
         # Fallback to python module
         self.log("websockify not in PATH, will use python3 -m websockify")
@@ -304,7 +637,7 @@ class NoVNCManager:
         
         try:
             with open(self.log_file, "a") as log_f:
-                self.process = subprocess.Popen(
+                self.process = _spawn(
                     websockify_cmd + [
                         f"--web={self.web_dir}",
                         str(self.web_port),
@@ -325,38 +658,32 @@ class NoVNCManager:
         """Wait for noVNC proxy to be ready."""
         self.log("Waiting for noVNC proxy to be ready...")
         
-        for i in range(timeout):
-            if self.process and self.process.poll() is not None:
-                self.log("ERROR: websockify process exited")
-                return False
-            
-            # Check if port is listening
-            try:
-                result = subprocess.run(
-                    ["netstat", "-tlnp"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0 and f":{self.web_port} " in result.stdout:
-                    self.log("✓ noVNC proxy is ready")
-                    return True
-                
-                # Try ss as fallback
-                result = subprocess.run(
-                    ["ss", "-tlnp"],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0 and f":{self.web_port} " in result.stdout:
-                    self.log("✓ noVNC proxy is ready")
-                    return True
-            except Exception:
-                pass
-            
-            time.sleep(1)
+        result = _wait(self._check_ready, timeout)
+        if result is None:
+            self.log("ERROR: noVNC proxy failed to start")
+        return bool(result)
+    
+    async def wait_for_ready_async(self, timeout: int = 30) -> bool:
+        """Wait for noVNC proxy to be ready without blocking the event loop."""
+        self.log("Waiting for noVNC proxy to be ready...")
         
-        self.log("ERROR: noVNC proxy failed to start")
-        return False
+        result = await _wait_async(self._check_ready, timeout)
+        if result is None:
+            self.log("ERROR: noVNC proxy failed to start")
+        return bool(result)
+    
+    def _check_ready(self) -> Optional[bool]:
+        """Readiness check for _wait: True when ready, False if websockify died, else None."""
+        if self.process and self.process.poll() is not None:
+            self.log("ERROR: websockify process exited")
+            return False
+        
+        # Check if port is listening
+        if _port_open(self.web_port):
+            self.log("✓ noVNC proxy is ready")
+            return True
+        
+        return None
     
     def stop(self):
         """Stop websockify process."""
@@ -389,11 +716,10 @@ class WindowManager:
         """Start xterm window manager."""
         self.log("=== Starting window manager ===")
         
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        env = self.config.display_env
         
         try:
-            self.process = subprocess.Popen(
+            self.process = _spawn(
                 ["xterm", "-geometry", "80x24+0+0", "-e", "/bin/bash"],
                 env=env
             )
@@ -405,11 +731,10 @@ class WindowManager:
 
     def _run_xdotool(self, *args) -> Optional[str]:
         """Run xdotool on this DISPLAY and return stdout, if any."""
-        env = os.environ.copy()
-        env["DISPLAY"] = self.config.display
+        env = self.config.display_env
         try:
             result = subprocess.run(
-                ["xdotool", *args],
+                ("xdotool",) + args,
                 capture_output=True,
                 text=True,
                 env=env,
@@ -34,6 +34,7 @@ if [ "${SKIP_SYSTEM_DEPS:-0}" != "1" ]; then
         python3 \
         python3-pip \
         python3-numpy \
+        python3-xlib \
         net-tools \
         curl \
         xdotool \
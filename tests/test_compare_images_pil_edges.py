@@ -1,10 +1,17 @@
 import os
 import tempfile
 import unittest
+from unittest import mock
 
 from PIL import Image
 
-from ibgateway_manager.screenshot import compare_images_pil
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover
+    HAS_NUMPY = False
+
+from ibgateway_manager.screenshot import compare_images_pil, load_reference_image
 
 
 class TestCompareImagesPilEdges(unittest.TestCase):
@@ -27,3 +34,116 @@ class TestCompareImagesPilEdges(unittest.TestCase):
 
             result = compare_images_pil(a, b)
             self.assertTrue(result["is_match"])
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is required")
+    def test_raw_sidecar_is_preferred_over_png(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.png")
+            b = os.path.join(td, "b.png")
+            Image.new("RGB", (10, 10), (0, 0, 0)).save(a)
+            # Same pixels but different bytes, so the identical-file fast path
+            # doesn't answer before the sidecar is read.
+            Image.new("RGB", (10, 10), (0, 0, 0)).save(b, compress_level=0)
+            np.save(b + ".npy", np.full((10, 10, 3), 255, dtype=np.uint8))
+
+            result = compare_images_pil(a, b)
+            self.assertFalse(result["is_match"])
+            self.assertEqual(result["max_diff"], 255)
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is required")
+    def test_raw_sidecars_on_both_sides_skip_decoding(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.png")
+            b = os.path.join(td, "b.png")
+            Image.new("RGB", (10, 10), (0, 0, 0)).save(a)
+            Image.new("RGB", (10, 10), (0, 0, 0)).save(b, compress_level=0)
+            np.save(a + ".npy", np.zeros((10, 10, 3), dtype=np.uint8))
+            raw = np.zeros((10, 10, 3), dtype=np.uint8)
+            raw[:5] = 255
+            np.save(b + ".npy", raw)
+
+            with mock.patch(
+                "ibgateway_manager.screenshot._open_image", side_effect=AssertionError("decoded")
+            ):
+                result = compare_images_pil(a, b, max_diff_percentage=10.0, stop_early=True)
+            self.assertTrue(result["has_changes"])
+            self.assertEqual(result["max_diff"], 255)
+
+    def test_downsample_detects_layout_change(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.png")
+            b = os.path.join(td, "b.png")
+            Image.new("RGB", (40, 40), (0, 0, 0)).save(a)
+            img = Image.new("RGB", (40, 40), (0, 0, 0))
+            img.paste((255, 255, 255), (0, 0, 20, 40))
+            img.save(b)
+
+            result = compare_images_pil(a, b, downsample=4)
+            self.assertFalse(result["is_match"])
+            self.assertAlmostEqual(result["diff_percentage"], 50.0)
+
+    def test_downsample_mixes_jpeg_draft_and_png(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.jpg")
+            b = os.path.join(td, "b.png")
+            Image.new("RGB", (64, 48), (90, 90, 90)).save(a, quality=95)
+            Image.new("RGB", (64, 48), (90, 90, 90)).save(b)
+
+            # The JPEG shrinks in its decoder, the PNG via reduce(); both end up 16x12.
+            result = compare_images_pil(a, b, downsample=4)
+            self.assertTrue(result["is_match"])
+
+    def test_grayscale_mode_diffs_single_channel(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.png")
+            b = os.path.join(td, "b.png")
+            Image.new("RGB", (20, 20), (0, 0, 0)).save(a)
+            img = Image.new("RGB", (20, 20), (0, 0, 0))
+            img.paste((255, 255, 255), (0, 0, 5, 20))
+            img.save(b)
+
+            result = compare_images_pil(a, b, mode="L")
+            self.assertEqual(result["max_diff"], 255)
+            self.assertAlmostEqual(result["diff_percentage"], 25.0)
+
+    def test_matching_digest_sidecars_short_circuit(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.png")
+            b = os.path.join(td, "b.png")
+            # Sizes differ, so reaching the decode path would raise.
+            Image.new("RGB", (10, 10), (0, 0, 0)).save(a)
+            Image.new("RGB", (12, 10), (0, 0, 0)).save(b)
+            for path in (a, b):
+                with open(path + ".sha256", "w") as f:
+                    f.write("same")
+
+            result = compare_images_pil(a, b)
+            self.assertTrue(result["is_match"])
+            self.assertEqual(result["diff_percentage"], 0.0)
+
+    def test_identical_files_short_circuit_without_sidecars(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.png")
+            b = os.path.join(td, "b.png")
+            with open(a, "wb") as f:
+                f.write(b"not an image")  # decoding would raise
+            with open(b, "wb") as f:
+                f.write(b"not an image")
+
+            result = compare_images_pil(a, b)
+            self.assertTrue(result["is_match"])
+
+    def test_predecoded_reference_matches_path(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            a = os.path.join(td, "a.png")
+            b = os.path.join(td, "b.png")
+            Image.new("L", (20, 20), 0).save(a)
+            img = Image.new("RGB", (20, 20), (0, 0, 0))
+            img.paste((255, 255, 255), (0, 0, 10, 20))
+            img.save(b)
+
+            reference = load_reference_image(a)
+            os.remove(a)  # the decoded reference must not need the file
+            result = compare_images_pil(a, b, reference=reference)
+            self.assertEqual(reference.mode, "RGB")
+            self.assertAlmostEqual(result["diff_percentage"], 50.0)
@@ -0,0 +1,38 @@
+import unittest
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover
+    HAS_NUMPY = False
+
+from PIL import Image, ImageChops
+
+from ibgateway_manager.screenshot import _diff_stats, _diff_stats_numpy
+
+
+@unittest.skipUnless(HAS_NUMPY, "numpy is required")
+class TestDiffStats(unittest.TestCase):
+    def test_matches_pillow_grayscale_diff(self) -> None:
+        rng = np.random.default_rng(0)
+        a = rng.integers(0, 256, size=(17, 23, 3), dtype=np.uint8)
+        b = a.copy()
+        b[3:9, 4:15] = rng.integers(0, 256, size=(6, 11, 3), dtype=np.uint8)
+
+        diff = ImageChops.difference(Image.fromarray(a), Image.fromarray(b)).convert("L")
+        expected = np.asarray(diff, dtype=np.int64)
+
+        diff_sum, max_diff, nonzero = _diff_stats(a.ravel(), b.ravel())
+        self.assertEqual(diff_sum, int(expected.sum()))
+        self.assertEqual(max_diff, int(expected.max()))
+        self.assertEqual(nonzero, int(np.count_nonzero(expected)))
+
+    def test_numpy_fallback_matches_kernel(self) -> None:
+        rng = np.random.default_rng(1)
+        a = rng.integers(0, 256, size=(31, 29, 3), dtype=np.uint8).ravel()
+        b = rng.integers(0, 256, size=(31, 29, 3), dtype=np.uint8).ravel()
+        self.assertEqual(_diff_stats_numpy(a, b), _diff_stats(a, b))
+
+    def test_identical_buffers(self) -> None:
+        a = np.full((4, 4, 3), 200, dtype=np.uint8).ravel()
+        self.assertEqual(_diff_stats(a, a.copy()), (0, 0, 0))
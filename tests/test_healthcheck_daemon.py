@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from ibgateway_manager import healthcheck_daemon
+from ibgateway_manager.healthcheck import HealthcheckConfig, query_daemon
+from ibgateway_manager.healthcheck_daemon import HealthcheckDaemon
+
+RESULT = (0, "[HEALTHCHECK] ok: 127.0.0.1:4002 accepting connections")
+
+
+class TestHealthcheckDaemon(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.socket_path = os.path.join(tmp.name, "health.sock")
+
+        patcher = mock.patch.object(healthcheck_daemon, "run_checks", return_value=RESULT)
+        self.run_checks = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        cfg = HealthcheckConfig(host="127.0.0.1", port=4002, timeout_seconds=1.0)
+        # A long interval so the first check is the only one during the test
+        self.daemon = HealthcheckDaemon(cfg, socket_path=self.socket_path, interval_seconds=60)
+        self.daemon.start()
+        self.addCleanup(self.daemon.stop)
+        deadline = time.monotonic() + 5
+        while self.daemon.current() != RESULT:
+            self.assertLess(time.monotonic(), deadline, "first check never completed")
+            time.sleep(0.01)
+
+    def test_query_returns_cached_result(self) -> None:
+        self.assertEqual(query_daemon(self.socket_path, timeout=5), RESULT)
+        self.assertEqual(query_daemon(self.socket_path, timeout=5), RESULT)
+        self.assertEqual(self.run_checks.call_count, 1)
+
+    def test_stale_result_reports_unhealthy(self) -> None:
+        with self.daemon._lock:
+            self.daemon._checked_at -= 3 * self.daemon.interval_seconds + 10
+        code, message = query_daemon(self.socket_path, timeout=5)
+        self.assertEqual(code, 1)
+        self.assertTrue(message.startswith("[HEALTHCHECK] stale: "), message)
+        self.assertIn(RESULT[1], message)
+
+    def test_stop_removes_the_socket(self) -> None:
+        self.daemon.stop()
+        self.assertFalse(os.path.exists(self.socket_path))
+        self.assertIsNone(query_daemon(self.socket_path, timeout=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+import unittest
+
+
+class TestHealthcheckImports(unittest.TestCase):
+    def test_healthcheck_does_not_import_heavy_modules(self) -> None:
+        # Fresh interpreter, as Docker's HEALTHCHECK runs it.
+        code = (
+            "import sys, ibgateway_manager.healthcheck\n"
+            "heavy = ('dotenv', 'PIL', 'numpy', 'Xlib', 'ibgateway_manager.config')\n"
+            "print(','.join(m for m in heavy if m in sys.modules))\n"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        self.assertEqual(out, "")
+
+    def test_package_exports_resolve_lazily(self) -> None:
+        import ibgateway_manager
+        from ibgateway_manager.config import Config
+
+        self.assertIs(ibgateway_manager.Config, Config)
+        with self.assertRaises(AttributeError):
+            ibgateway_manager.DoesNotExist
@@ -0,0 +1,114 @@
+import os
+import socket
+import threading
+import types
+import unittest
+
+from ibgateway_manager.port_forwarder import PortForwarder
+
+TAIL = b"bye"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _recv_all(sock: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+class _EchoServer:
+    """Loopback server that echoes until EOF, then sends TAIL and closes."""
+
+    def __init__(self) -> None:
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._echo, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _echo(conn: socket.socket) -> None:
+        with conn:
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    break
+                conn.sendall(chunk)
+            conn.sendall(TAIL)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class TestPortForwarder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.echo = _EchoServer()
+        self.addCleanup(self.echo.close)
+        self.forwarder = PortForwarder(types.SimpleNamespace())
+        self.forwarder.live_port = self.echo.port
+        self.forwarder.paper_port = _free_port()  # nothing listens here
+        self.forwarder.forward_live_port = _free_port()
+        self.forwarder.forward_paper_port = _free_port()
+        self.assertTrue(self.forwarder.start_background())
+        self.addCleanup(self.forwarder.stop)
+
+    def _connect(self, port: int) -> socket.socket:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=10)
+        self.addCleanup(sock.close)
+        return sock
+
+    def test_large_payload_round_trip(self) -> None:
+        payload = os.urandom(8 * 1024 * 1024)
+        sock = self._connect(self.forwarder.forward_live_port)
+
+        def send() -> None:
+            sock.sendall(payload)
+            sock.shutdown(socket.SHUT_WR)
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        received = _recv_all(sock)
+        sender.join()
+        self.assertEqual(received, payload + TAIL)
+
+    def test_half_closed_client_still_receives_the_tail(self) -> None:
+        sock = self._connect(self.forwarder.forward_live_port)
+        sock.sendall(b"hello")
+        sock.shutdown(socket.SHUT_WR)
+        self.assertEqual(_recv_all(sock), b"hello" + TAIL)
+
+    def test_refused_upstream_closes_the_client(self) -> None:
+        sock = self._connect(self.forwarder.forward_paper_port)
+        try:
+            self.assertEqual(sock.recv(1), b"")
+        except ConnectionResetError:
+            pass
+
+    def test_stop_tears_down_the_loop(self) -> None:
+        loop, thread = self.forwarder._loop, self.forwarder._thread
+        self.forwarder.stop()
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(loop.is_closed())
+        self.assertFalse(self.forwarder.forwarding_ready())
+        with self.assertRaises(ConnectionRefusedError):
+            socket.create_connection(("127.0.0.1", self.forwarder.forward_live_port), timeout=1).close()
+
+
+if __name__ == "__main__":
+    unittest.main()
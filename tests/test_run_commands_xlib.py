@@ -0,0 +1,85 @@
+import types
+import unittest
+from unittest import mock
+
+from ibgateway_manager import automate_ibgateway
+from ibgateway_manager.automate_ibgateway import AutomationHandler
+
+COMMANDS = (["mousemove", "311", "212"], ["click", "1"])
+
+
+def _x_error():
+    """A BadMatch error as python-xlib decodes it from the server."""
+    from Xlib import error as xerror
+    return xerror.XError(None, bytes([0, 8, 0, 0, 0, 0, 0, 0, 0, 0, 12]) + bytes(21))
+
+
+@unittest.skipUnless(automate_ibgateway.HAS_XLIB, "python-xlib not installed")
+class TestRunCommandsXlib(unittest.TestCase):
+    def setUp(self) -> None:
+        config = types.SimpleNamespace(
+            screenshot_dir="/tmp", save_raw_screenshots=False, display=":99",
+            display_env={"DISPLAY": ":99"},
+        )
+        self.handler = AutomationHandler(config)
+        self.sent = []
+
+    def _patch_xlib(self, fail_at: int) -> None:
+        """Give the handler a fake display whose action number fail_at raises."""
+        def action(i: int):
+            def send() -> None:
+                self.sent.append(i)
+                if i == fail_at:
+                    raise _x_error()
+            return send
+
+        numbers = iter(range(len(COMMANDS)))
+        patches = [
+            mock.patch.object(self.handler, "_xlib_input", return_value=mock.Mock()),
+            mock.patch.object(
+                self.handler, "_compile_xlib_command",
+                side_effect=lambda d, command: [action(next(numbers))],
+            ),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _patch_xdotool(self):
+        patches = [
+            mock.patch.object(automate_ibgateway.subprocess, "run",
+                              return_value=mock.Mock(returncode=0)),
+            mock.patch.object(automate_ibgateway, "_spawn_and_capture", return_value=(0, b"")),
+        ]
+        for p in patches:
+            self.addCleanup(p.stop)
+        return [p.start() for p in patches]
+
+    def test_partial_send_reports_failure(self) -> None:
+        self._patch_xlib(fail_at=1)
+        self.assertIsNone(self.handler._run_commands_xlib(COMMANDS))
+        self.assertEqual(self.sent, [0, 1])
+
+    def test_partial_send_is_not_replayed_through_xdotool(self) -> None:
+        run, spawn = self._patch_xdotool()
+        for method in (self.handler.run_xdotool_script, self.handler.run_xdotool_chain):
+            with self.subTest(method=method.__name__):
+                self._patch_xlib(fail_at=1)
+                self.assertFalse(method(*COMMANDS))
+        run.assert_not_called()
+        spawn.assert_not_called()
+
+    def test_failure_before_any_action_falls_back(self) -> None:
+        self._patch_xlib(fail_at=0)
+        self.assertIs(self.handler._run_commands_xlib(COMMANDS), False)
+        self.assertEqual(self.sent, [0])
+
+    def test_fallback_runs_the_whole_batch_through_xdotool(self) -> None:
+        run, _ = self._patch_xdotool()
+        self._patch_xlib(fail_at=0)
+        self.assertTrue(self.handler.run_xdotool_script(*COMMANDS))
+        self.assertEqual(run.call_args[1]["input"], "mousemove 311 212\nclick 1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from ibgateway_manager import screenshot
+from ibgateway_manager.screenshot import ScreenshotHandler
+
+
+class TestSaveCaptured(unittest.TestCase):
+    def test_concurrent_saves_get_distinct_names(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            config = types.SimpleNamespace(
+                screenshot_dir=td, save_raw_screenshots=False, display=":99"
+            )
+            handler = ScreenshotHandler(config)
+            target = os.path.join(td, "shot.png")
+            frame = Image.new("RGB", (64, 64), (10, 20, 30))
+            paths = []
+
+            def save() -> None:
+                paths.append(handler._save_captured(frame, target))
+
+            threads = [threading.Thread(target=save) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertNotIn(None, paths)
+            self.assertEqual(len(set(paths)), 8)
+
+    def test_sidecars_written_from_frame_and_pruned_periodically(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            config = types.SimpleNamespace(
+                screenshot_dir=td, save_raw_screenshots=False, display=":99",
+                raw_retention_minutes=30,
+            )
+            handler = ScreenshotHandler(config)
+            frame = Image.new("RGB", (64, 64), (10, 20, 30))
+
+            plain = handler._save_captured(frame, os.path.join(td, "plain.png"))
+            self.assertFalse(os.path.exists(plain + ".sha256"))
+
+            config.save_raw_screenshots = True
+            with mock.patch.object(screenshot.Image, "open", side_effect=AssertionError("PNG re-read")):
+                old = handler._save_captured(frame, os.path.join(td, "old.png"))
+            with open(old, "rb") as f:
+                expected = hashlib.sha256(f.read()).hexdigest()
+            with open(old + ".sha256") as f:
+                self.assertEqual(f.read(), expected)
+            self.assertEqual(np.load(old + ".npy").tolist(), np.asarray(frame).tolist())
+
+            stale = time.time() - 31 * 60
+            for sidecar in glob.glob(old + ".*"):
+                os.utime(sidecar, (stale, stale))
+            # The sweep ran on the first save and isn't due again yet
+            handler._save_captured(frame, os.path.join(td, "new.png"))
+            self.assertEqual(len(glob.glob(old + ".*")), 2)
+
+            with mock.patch.object(screenshot, "_SIDECAR_PRUNE_INTERVAL", 0.0):
+                handler._save_captured(frame, os.path.join(td, "newer.png"))
+            self.assertEqual(glob.glob(old + ".*"), [])
+            self.assertTrue(os.path.exists(os.path.join(td, "newer.png.sha256")))
@@ -0,0 +1,31 @@
+import os
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from ibgateway_manager.screenshot import ScreenshotHandler
+
+
+class TestWaitForStateMatch(unittest.TestCase):
+    def test_grayscale_mode_accepts_hue_only_change(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            config = types.SimpleNamespace(
+                screenshot_dir=td, save_raw_screenshots=False, display=":99"
+            )
+            handler = ScreenshotHandler(config)
+            reference = os.path.join(td, "reference.png")
+            Image.new("RGB", (64, 64), (200, 100, 100)).save(reference)
+            # Different hue, same luma: RGB diff is large, grey diff is zero.
+            frame = Image.new("RGB", (64, 64), (100, 151, 100))
+
+            with mock.patch.object(handler, "capture_image", return_value=frame), \
+                    mock.patch.object(handler, "_open_change_watcher", return_value=None):
+                matched, result = handler.wait_for_state_match(
+                    reference, "current.png", timeout=2, mode="L"
+                )
+
+            self.assertTrue(matched)
+            self.assertEqual(result["mean_diff"], 0.0)